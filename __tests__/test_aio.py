@@ -0,0 +1,114 @@
+import asyncio
+
+from src import *
+
+edge, path = functor("edge", 2), functor("path", 2)
+X, Y, Z = variables("XYZ")
+a, b, c = Term("a"), Term("b"), Term("c")
+
+
+def graph():
+    return LinearTable([
+        edge(a, b), edge(b, c),
+        path(X, Y) <= edge(X, Y),
+        path(X, Y) <= edge(X, Z) & path(Z, Y),
+    ])
+
+
+async def collect(answers):
+    return [ans async for ans in answers]
+
+
+class Lookup(Comparison):
+    """binds x2 to x1 after waiting on (pretend) I/O"""
+    async def test(self, binding):
+        await asyncio.sleep(0)
+        s = unify(self.x1, self.x2, binding)
+        return [] if s == NO else [s]
+
+
+def test_async_matches_sync():
+    for sync, async_ in [(bc_ask, bc_ask_async), (id_ask, id_ask_async)]:
+        expected = list(take(2, sync(graph(), path(a, X))))
+        answers = asyncio.run(collect(async_(graph(), path(a, X), patience=5)))
+        assert answers[:2] == expected
+    assert asyncio.run(collect(fc_ask_async(graph(), path(a, X)))) == list(fc_ask(graph(), path(a, X)))
+    assert asyncio.run(collect(id_ask_async(graph(), path(X, Y)))) == list(id_ask(graph(), path(X, Y)))
+
+
+def test_async_constraint():
+    tb = LinearTable([edge(a, b), path(X, Y) <= edge(X, Z) & Lookup(Z, Y)])
+    assert asyncio.run(collect(bc_ask_async(tb, path(a, Y)))) == [{Y: b}]
+
+
+def test_async_yields_to_loop():
+    chain = LinearTable([edge(i, i + 1) for i in range(200)] + [
+        path(X, Y) <= edge(X, Y),
+        path(X, Y) <= edge(X, Z) & path(Z, Y),
+    ])
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        task = asyncio.ensure_future(ticker())
+        answers = await collect(bc_ask_async(chain, path(0, X), every=10))
+        task.cancel()
+        return answers, ticks
+
+    answers, ticks = asyncio.run(main())
+    assert len(answers) == 200
+    assert ticks > 10
+
+
+def test_async_cancel():
+    loop = LinearTable([path(X, Y) <= path(Y, X)])
+
+    async def main():
+        task = asyncio.ensure_future(collect(bc_ask_async(loop, path(a, b))))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            return True
+        return False
+
+    assert asyncio.run(main())
+
+
+def test_async_cut():
+    first = functor("first", 1)
+    tb = LinearTable([edge(a, b), edge(a, c), first(Y) <= edge(a, Y) & CUT])
+    assert asyncio.run(collect(bc_ask_async(tb, first(Y)))) == [{Y: b}]
+
+
+def test_async_negation():
+    tb = LinearTable([edge(a, b), edge(b, c), path(X, Y) <= edge(X, Y) & ~edge(Y, Z)])
+    for ask in (bc_ask_async, id_ask_async):
+        assert asyncio.run(collect(ask(tb, path(X, Y)))) == [{X: b, Y: c}]
+    assert asyncio.run(collect(fc_ask_async(tb, path(X, Y)))) == [{X: b, Y: c}]
+
+
+def test_async_first_only():
+    answers = asyncio.run(collect(bc_ask_async(graph(), path(X, Y), first_only=True)))
+    assert answers == list(bc_ask(graph(), path(X, Y), first_only=True))
+    assert len(answers) == 1
+
+
+def test_async_constraint_under_negation():
+    tb = LinearTable([edge(a, b), edge(b, c), path(X, Y) <= edge(X, Y) & ~Lookup(Y, b)])
+    for ask in (bc_ask_async, id_ask_async, fc_ask_async):
+        assert asyncio.run(collect(ask(tb, path(X, Y)))) == [{X: b, Y: c}]
+
+
+def test_async_suspended_answer():
+    small = functor("small", 1)
+    tb = LinearTable([small(X) <= LE(X, 5)])
+    for ask in (bc_ask_async, id_ask_async, fc_ask_async):
+        assert asyncio.run(collect(ask(tb, small(X)))) == []
@@ -0,0 +1,32 @@
+from benchmarks import harness
+
+
+def test_grid():
+    @harness.benchmark("test", a=[1, 2], b=["x"])
+    def work(rng, a, b):
+        return lambda: None
+
+    try:
+        assert "test/work[a=1,b=x]" in harness._registry
+        assert "test/work[a=2,b=x]" in harness._registry
+        results = harness.run("test/work", repeat=2, min_time=0)
+        assert set(results["results"]) == {"test/work[a=1,b=x]", "test/work[a=2,b=x]"}
+    finally:
+        for name in [name for name in harness._registry if name.startswith("test/work[")]:
+            del harness._registry[name]
+
+
+def test_compare():
+    baseline = {"results": {"a": {"median": 1.0}, "b": {"median": 1.0}, "gone": {"median": 1.0}}}
+    results = {"results": {"a": {"median": 1.1}, "b": {"median": 2.0}, "new": {"median": 5.0}}}
+    assert harness.compare(results, baseline, tolerance=0.25) == [("b", 2.0)]
+
+    baseline = {"results": {"slow": {"median": 1.0, "min": 0.5}, "tiny": {"median": 2e-6, "min": 1e-6}}}
+    results = {"results": {"slow": {"median": 2.0, "min": 0.55}, "tiny": {"median": 9e-6, "min": 8e-6}}}
+    assert harness.compare(results, baseline, tolerance=0.25) == []  # the fastest samples, by more than the floor
+
+    baseline = {"results": {"busy": {"median": 1.0, "min": 1.0, "reference": 1.0}}}
+    results = {"results": {"busy": {"median": 3.0, "min": 3.0, "reference": 2.0}}}
+    assert harness.compare(results, baseline, tolerance=1.0) == []  # the whole machine ran slower
+    results["results"]["busy"]["reference"] = 1.0
+    assert harness.compare(results, baseline, tolerance=1.0) == [("busy", 3.0)]
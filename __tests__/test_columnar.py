@@ -0,0 +1,51 @@
+import subprocess
+import sys
+
+import pytest
+from src import *
+
+np = pytest.importorskip("numpy")
+
+X, Y, Z = variables("XYZ")
+edge = functor("edge", 2)
+a, b, c, d = Term("a"), Term("b"), Term("c"), Term("d")
+store = ColumnStore([edge(a, b), edge(b, c), edge(c, a), edge(c, d), edge(d, d)])
+
+
+def test_join():
+    answers = [ans for batch in store.ask(edge(X, Z) & edge(Z, Y)) for ans in batch]
+    assert sorted((str(ans[X]), str(ans[Y])) for ans in answers) == \
+        sorted([("a", "c"), ("b", "a"), ("b", "d"), ("c", "b"), ("c", "d"), ("d", "d")])
+
+
+def test_selection():
+    assert list(store.ask(edge(X, X))) == [[{X: d}]]
+    assert list(store.ask(edge(c, X) & edge(X, a))) == []
+    assert list(store.ask(edge(Term("nowhere"), X))) == []
+    assert list(store.ask(edge(a, b))) == [[{}]]
+
+
+def test_batches():
+    store.tell(edge(a, c))
+    batches = list(store.ask(edge(X, Y), batch_size=4))
+    assert [len(batch) for batch in batches] == [4, 2]
+
+
+def test_columnar_table():
+    hop = functor("hop", 2)
+    rules = [edge(a, b), edge(b, c), edge(c, a), edge(c, d), edge(d, d), hop(X, Y) <= edge(X, Z) & edge(Z, Y)]
+    tb = ColumnarTable(LinearTable(rules))
+    with Tracer() as tracer:
+        answers = list(bc_ask(tb, hop(X, Y)))
+    assert tracer.predicates["edge/2"].calls == 0  # the body was joined in one go
+    assert sorted(map(str, answers)) == sorted(map(str, bc_ask(LinearTable(rules), hop(X, Y))))
+    assert list(bc_ask(tb, hop(a, Y))) == [{Y: c}]
+
+    tb.tell(edge(X, a) <= edge(a, X))  # edge has a rule now, so its joins go back to the engine
+    assert sorted(map(str, bc_ask(tb, hop(X, Y), patience=3))) == \
+        sorted(map(str, bc_ask(LinearTable(tb.rules()), hop(X, Y), patience=3)))
+
+
+def test_numpy_imported_lazily():
+    check = "import sys, src; assert 'numpy' not in sys.modules"
+    assert subprocess.run([sys.executable, "-c", check]).returncode == 0
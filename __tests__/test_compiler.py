@@ -0,0 +1,47 @@
+from src import *
+from anything import Anything
+
+sibling = functor("sibling", 2)
+friend = functor("friend", 2)
+X, Y, Z = variables("XYZ")
+Leo = Term("Leo")
+Milo = Term("Milo")
+Declan = Term("Declan")
+
+rules = [
+    sibling(Milo, Leo),
+    sibling(Leo, Declan),
+    sibling(X, Y) <= sibling(Y, X),
+    sibling(X, X) <= friend(X, Term("me", (Y,))),
+]
+
+
+def test_same_answers():
+    linear, compiled = LinearTable(rules), CompiledTable(LinearTable(rules))
+    assert take(20, bc_ask(compiled, sibling(X, Y))) == take(20, bc_ask(linear, sibling(X, Y)))
+    assert list(bc_ask(compiled, sibling(Leo, Milo), patience=1)) == [{}]
+    assert list(bc_ask(compiled, sibling(Leo, Milo), patience=0)) == []
+
+
+def test_compiled_head():
+    compiled = CompiledTable(LinearTable(rules))
+    trail = Trail()
+    bodies = list(resolve(body, trail) for body, _ in compiled.match(sibling(Leo, Leo), trail))
+    assert bodies[:2] == [sibling(Leo, Leo), friend(Leo, Term("me", (Anything,)))]
+    assert trail.to_dict() == {}
+
+
+def test_tell_recompiles():
+    compiled = CompiledTable(PredicateIndex(rules))
+    assert list(bc_ask(compiled, friend(Leo, X))) == []
+    compiled.tell(friend(Leo, Declan))
+    assert list(bc_ask(compiled, friend(Leo, X))) == [{X: Declan}]
+
+
+def test_variables_sharing_a_name():
+    item, pair = functor("item", 1), functor("pair", 0)
+    rules = [item(Leo), item(Milo), pair() <= item(Variable("Z", 1)) & item(Variable("Z", 2))]
+    compiled = CompiledTable(LinearTable(rules))
+    with Tracer() as tracer:
+        assert len(list(bc_ask(compiled, pair()))) == 4
+    assert tracer.predicates["item/1"].candidates == 2 + 2 * 2
@@ -15,3 +15,55 @@ def test_Eq():
     assert list(Equals(x, Leo).test({x: Leo}))
     assert list(Equals(sibling(x, y), sibling(Leo, Declan)).test({}))
     assert not list(Equals(x, Leo).test({x: Declan}))
+
+
+def test_suspended_comparisons():
+    num, mid, clash, pair = functor("num", 1), functor("mid", 1), functor("clash", 2), functor("pair", 2)
+    tb = HashTable([num(i) for i in range(20)] + [
+        mid(x) <= LE(x, 10) & GE(x, 5) & num(x),
+        clash(x, y) <= GE(x, 3) & LE(y, 3) & LT(x, y) & num(x) & num(y),
+        pair(x, y) <= LT(x, y) & LE(y, 2) & num(x) & num(y),
+    ])
+    assert [ans[x] for ans in bc_ask(tb, mid(x))] == [5, 6, 7, 8, 9, 10]
+    assert list(bc_ask(tb, pair(x, y))) == [{x: 0, y: 1}, {x: 0, y: 2}, {x: 1, y: 2}]
+    with Tracer() as tracer:
+        assert list(bc_ask(tb, clash(x, y))) == []
+    assert tracer.predicates["num/1"].calls == 0  # pruned before generating anything
+
+
+def test_domains():
+    trail = Trail()
+    assert list(LE(x, 5).test(trail)) and list(GE(y, 7).test(trail))
+    assert trail.attribute(x).domain == Interval(hi=5)
+    mark = trail.checkpoint()
+    assert not trail.unify(x, y)  # their domains don't overlap
+    assert not trail.unify(x, 6)
+    assert trail.unify(x, 4.5)
+    trail.rollback(mark)
+    assert x not in trail and trail.attribute(x).domain == Interval(hi=5)
+
+    trail = Trail()
+    assert list(Integer(x).test(trail)) and list(GT(x, 2).test(trail))
+    assert not list(LT(x, 3).test(trail))
+    assert not trail.unify(x, 3.5)
+    assert list(LE(x, 5).test({x: 4})) and not list(LE(x, 5).test({}))
+
+
+def test_comparisons_of_non_numbers():
+    price, cheap, dear = functor("price", 2), functor("cheap", 1), functor("dear", 1)
+    a, b, c, d = Term("a"), Term("b"), Term("c"), Term("d")
+    rules = [price(a, 1), price(b, Leo), price(c, 3), price(d, "three"),
+             cheap(x) <= price(x, y) & LE(y, 2),
+             dear(x) <= price(x, y) & GT(y, 2)]
+    for tb in [LinearTable(rules), HashTable(rules), PlannedTable(LinearTable(rules)), RangeIndex(rules)]:
+        assert list(bc_ask(tb, cheap(x))) == [{x: a}]
+        assert list(bc_ask(tb, dear(x))) == [{x: c}]
+    assert not list(LE(x, 2).test({x: Leo})) and not list(GT(x, 2).test({x: "three"}))
+
+
+def test_suspended_answers():
+    num, small, small_num = functor("num", 1), functor("small", 1), functor("small_num", 1)
+    rules = [num(3), num(7), small(x) <= LE(x, 5), small_num(x) <= LE(x, 5) & num(x)]
+    for ask in (bc_ask, bc_ask_iterative, id_ask, fc_ask):
+        assert list(ask(LinearTable(rules), small(x))) == []  # not true for every x
+        assert list(ask(LinearTable(rules), small_num(x))) == [{x: 3}]
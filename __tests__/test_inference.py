@@ -39,5 +39,113 @@ def test_bc():
 
 def test_id():
     assert next(id_ask(KB, sibling(Leo, Milo))) == {}
-    assert {X: Leo, Y: Milo} in take(10, id_ask(KB, sibling(X, Y)))
+    assert {X: Leo, Y: Milo} in take(9, id_ask(KB, sibling(X, Y)))  # there are only 9 distinct answers
     assert next(id_ask(trap, obvious_reality)) == {}
+
+    anyone, same = functor("anyone", 1), functor("same", 2)
+    tb = LinearTable([anyone(X), same(X, X)])
+    for query in [anyone(Y), same(Y, Z), same(Leo, Z)]:
+        assert list(id_ask(tb, query)) == list(bc_ask(tb, query))
+
+
+def test_fc_closure():
+    edge, path = functor("edge", 2), functor("path", 2)
+    a, b, c = Term("a"), Term("b"), Term("c")
+    tb = LinearTable([
+        edge(a, b), edge(b, c), edge(c, a),
+        path(X, Y) <= edge(X, Y),
+        path(X, Y) <= edge(X, Z) & path(Z, Y),
+    ])
+    answers = list(fc_ask(tb, path(a, X)))
+    assert len(answers) == 3
+    assert {X: a} in answers
+    assert len(list(tb.facts())) == 3 + 9
+
+
+def test_fc_negation():
+    good, wicked, ok = functor("good", 1), functor("wicked", 1), functor("ok", 1)
+    for body in [good(X) & ~wicked(X), ~wicked(X) & good(X)]:
+        tb = LinearTable([good(Leo), good(Milo), wicked(Leo), ok(X) <= body])
+        assert list(fc_ask(tb, ok(X))) == [{X: Milo}]
+
+
+def test_bc_constraints():
+    age, older = functor("age", 2), functor("older", 2)
+    A, B = variables("AB")
+    tb = LinearTable([
+        age(Leo, 20), age(Milo, 17), age(Declan, 23),
+        older(X, Y) <= age(X, A) & age(Y, B) & GT(A, B),
+    ])
+    assert {Y: Milo} in list(bc_ask(tb, older(Leo, Y)))
+    assert len(list(bc_ask(tb, older(X, Y)))) == 3
+    assert len(list(fc_ask(tb, older(X, Y)))) == 3
+
+
+def test_bc_ask_many():
+    edge, path = functor("edge", 2), functor("path", 2)
+    nodes = [Term(i) for i in range(6)]
+    rules = [edge(i, j) for i, j in zip(nodes, nodes[1:])] + [
+        path(X, Y) <= edge(X, Y),
+        path(X, Y) <= edge(X, Z) & path(Z, Y),
+    ]
+
+    class CountingTable(LinearTable):
+        fetches = 0
+
+        def fetch(self, query, conditional=True):
+            if query.op == "path":
+                CountingTable.fetches += 1
+            return super().fetch(query, conditional)
+
+    queries = [path(node, Y) for node in nodes] + [path(nodes[0], Y), path(nodes[0], nodes[2])]
+    answers = list(bc_ask_many(CountingTable(rules), queries))
+    for query in dict.fromkeys(queries):
+        assert [ans for q, ans in answers if q == query] == list(bc_ask(LinearTable(rules), query))
+
+    mixed = [~path(nodes[0], nodes[2]), ~path(nodes[2], nodes[0]), once(path(nodes[0], Y)), GT(Y, 2)]
+    for query in mixed:
+        assert [ans for q, ans in bc_ask_many(LinearTable(rules), mixed) if q == query] ==\
+            list(bc_ask(LinearTable(rules), query))
+    assert [ans for q, ans in bc_ask_many(LinearTable(rules), mixed)] == [{}, {Y: nodes[1]}]
+
+    CountingTable.fetches = 0
+    list(bc_ask_many(CountingTable(rules), [path(node, Y) for node in nodes]))
+    with_rules = CountingTable.fetches
+    CountingTable.fetches = 0
+    for node in nodes:
+        list(bc_ask(CountingTable(rules), path(node, Y)))
+    assert with_rules < CountingTable.fetches
+
+
+def test_cut():
+    member, first, maximum = functor("member", 2), functor("first", 1), functor("max", 3)
+    classify = functor("classify", 2)
+    a, b, c, small, big = Term("a"), Term("b"), Term("c"), Term("small"), Term("big")
+    tb = LinearTable([
+        member(a, X), member(b, X), member(c, X),
+        first(Y) <= member(Y, X) & CUT,
+        classify(a, small) <= CUT,
+        classify(X, big) <= YES,
+        maximum(X, Y, X) <= GE(X, Y) & CUT,
+        maximum(X, Y, Y) <= YES,
+    ])
+    for ask in (bc_ask, bc_ask_iterative):
+        assert list(ask(tb, first(Y))) == [{Y: a}]
+        assert list(ask(tb, classify(a, Y))) == [{Y: small}]
+        assert list(ask(tb, classify(b, Y))) == [{Y: big}]
+        assert list(ask(tb, maximum(3, 2, Z))) == [{Z: 3}]
+        assert list(ask(tb, maximum(2, 3, Z))) == [{Z: 3}]
+        assert list(ask(tb, once(member(Y, X)))) == [{Y: a}]
+        assert list(ask(tb, member(Y, X), first_only=True)) == [{Y: a}]
+
+
+def test_id_resumes_frontier():
+    p, q, r = functor("p", 1), functor("q", 1), functor("r", 1)
+    a, b = Term("a"), Term("b")
+    # the deeper answer comes first in the search, so counting answers from the level before would skip it
+    tb = LinearTable([p(X) <= q(X), p(a), q(X) <= r(X), r(b), r(a)])
+    assert list(id_ask(tb, p(X), patience=5)) == [{X: a}, {X: b}]
+
+    first = functor("first", 1)
+    tb = LinearTable([first(X) <= p(X) & CUT, p(X) <= q(X), p(a), q(b)])
+    assert list(id_ask(tb, first(X))) == [{X: a}]  # the shallowest proof of p is the one committed to
@@ -1,4 +1,5 @@
 from src.language import *
+from src import table, inference
 
 
 def test_and():
@@ -65,3 +66,35 @@ def test_substitute():
 def test_standardize():
     x, y, z = Variable("X"), Variable("Y"), Variable("Z")
     assert standardize(x) != Variable("X")
+
+
+def test_hash_consing():
+    x = Variable("X")
+    assert Term("f", (Term("a"), 1)) is Term("f", [Term("a"), 1])
+    assert Variable("X") is x and Variable("X", 1) is not x
+    assert Term("f", (1.0,)).args[0].__class__ is float
+    assert not hasattr(Term("a"), "__dict__")
+
+
+def test_numeric_types_equal():
+    f, g, p = functor("f", 1), functor("g", 1), functor("p", 1)
+    assert f(1) == f(1.0) and hash(f(1)) == hash(f(1.0)) and f(1) != f(2)
+    assert g(f(1.0)).args[0].args[0].__class__ is float  # not interned as g(f(1))
+    for factory in [table.LinearTable, table.TrieTable, table.HashTable]:
+        assert list(inference.bc_ask(factory([p(f(1))]), p(f(1.0)))) == [{}]
+
+
+def test_map_unchanged():
+    x, y = variables("XY")
+    foo = Term("foo", (x, Term("bar", (y,))))
+    assert foo.map(lambda v: v) is foo
+    assert (foo & x).map(lambda v: v) is not None and Not(foo).map(lambda v: v).item is foo
+    assert substitute(foo, {y: 1}) == Term("foo", (x, Term("bar", (1,))))
+
+
+def test_number_variables():
+    x, y = variables("XY")
+    rule = number_variables(Term("foo", (x, (y, 1))) <= Term("bar", (y, x)))
+    assert rule.n_vars == 2
+    assert rule.head == Term("foo", (Variable("X", 0), (Variable("Y", 1), 1)))
+    assert rename(rule, 10).body == Term("bar", (Variable("Y", 11), Variable("X", 10)))
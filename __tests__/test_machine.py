@@ -0,0 +1,36 @@
+from src import *
+
+edge, path = functor("edge", 2), functor("path", 2)
+parent, grandparent = functor("parent", 2), functor("grandparent", 2)
+X, Y, Z = variables("XYZ")
+a, b, c, d = Term("a"), Term("b"), Term("c"), Term("d")
+
+
+def test_iterative_matches_recursive():
+    kbs = [
+        (LinearTable([
+            edge(a, b), edge(b, c), edge(c, d), edge(a, c),
+            path(X, Y) <= edge(X, Y),
+            path(X, Y) <= edge(X, Z) & path(Z, Y),
+        ]), [path(a, X), path(X, d), path(X, Y), path(d, X)]),
+        (HashTable([
+            parent(a, b), parent(b, c), parent(b, d),
+            grandparent(X, Z) <= parent(X, Y) & parent(Y, Z),
+            grandparent(X, Y) <= parent(X, Y) & Equals(X, a),
+        ]), [grandparent(X, Y), grandparent(a, X)]),
+    ]
+    for tb, queries in kbs:
+        for query in queries:
+            assert list(bc_ask_iterative(tb, query)) == list(bc_ask(tb, query))
+            assert list(bc_ask_iterative(tb, query, patience=1)) == list(bc_ask(tb, query, patience=1))
+
+
+def test_iterative_deep_proof():
+    n = 5000
+    nodes = [Term(f"n{i}") for i in range(n + 1)]
+    tb = HashTable([edge(nodes[i], nodes[i + 1]) for i in range(n)] + [
+        path(X, X) <= YES,
+        path(X, Y) <= edge(X, Z) & path(Z, Y),
+    ])
+    assert next(bc_ask_iterative(tb, path(nodes[0], nodes[n]))) == {}
+    assert len(list(bc_ask_iterative(tb, path(nodes[0], X)))) == n + 1
@@ -0,0 +1,44 @@
+from src import *
+
+X = Variable("X")
+muggle, wizard = functor("muggle", 1), functor("wizard", 1)
+has_wand, magical = functor("has_wand", 1), functor("magical", 1)
+harry, dudley = Term("harry"), Term("dudley")
+
+
+def hogwarts():
+    return prolog("""
+    muggle(X) :- not(wizard(X)), \\+ witch(X).
+    wizard(X) :- guy(X), magical(X).
+    witch(X) :- girl(X), magical(X).
+    has_wand(X) :- magical(X).
+    girl(hermione).
+    guy(harry).
+    guy(dudley).
+    magical(hermione).
+    magical(harry).
+    """)
+
+
+def test_negation_as_failure():
+    tb = HashTable(hogwarts())
+    for ask in (bc_ask, bc_ask_iterative, id_ask):
+        assert list(ask(tb, muggle(dudley))) == [{}]
+        assert list(ask(tb, muggle(harry))) == []
+        assert list(ask(tb, muggle(X))) == []  # there are wizards, so not(wizard(X)) fails
+
+
+def test_negations_memoized():
+    tb = NegationTable(HashTable(hogwarts()))
+    with Tracer() as tracer:
+        for _ in range(3):
+            assert list(bc_ask(tb, muggle(dudley))) == [{}]
+    assert tracer.predicates["wizard/1"].calls == 1
+    assert tb.negation(wizard(dudley), float("inf")) is True
+
+    tb.tell(has_wand(dudley))  # nothing muggle depends on
+    assert tb.negation(wizard(dudley), float("inf")) is True
+
+    tb.tell(magical(dudley))
+    assert tb.negation(wizard(dudley), float("inf")) is None
+    assert list(bc_ask(tb, muggle(dudley))) == []
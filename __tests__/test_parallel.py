@@ -0,0 +1,43 @@
+import multiprocessing
+import pickle
+import time
+
+from src import *
+
+X, Y, Z = variables("XYZ")
+edge = functor("edge", 2)
+path = functor("path", 2)
+nodes = [Term(f"n{i}") for i in range(8)]
+
+tb = HashTable(
+    [edge(a, b) for a, b in zip(nodes, nodes[1:])] +
+    [path(X, Y) <= edge(X, Y), path(X, Y) <= edge(X, Z) & path(Z, Y)]
+)
+
+
+def test_same_answers():
+    expected = sorted(str(ans) for ans in bc_ask(tb, path(X, Y)))
+    assert sorted(str(ans) for ans in parallel_bc_ask(tb, path(X, Y), max_workers=2)) == expected
+    assert list(parallel_bc_ask(tb, path(nodes[0], nodes[7]), max_workers=2)) == [{}]
+    assert list(parallel_bc_ask(tb, path(nodes[7], X), max_workers=2)) == []
+
+
+def test_limit():
+    assert len(list(parallel_bc_ask(tb, path(X, Y), limit=5, max_workers=2))) == 5
+
+
+def test_compiled_table_pickles():
+    compiled = pickle.loads(pickle.dumps(CompiledTable(tb)))
+    assert len(list(bc_ask(compiled, path(nodes[0], X)))) == 7
+
+
+def test_streams_and_stops():
+    nat, s = functor("nat", 1), functor("s", 1)
+    numbers = HashTable([nat(0), nat(s(X)) <= nat(X)])
+    answers = parallel_bc_ask(numbers, nat(X), max_workers=2, depth=1)
+    assert len(take(5, answers)) == 5  # the only alternative never finishes, so answers can't wait for it
+    answers.close()
+    deadline = time.time() + 10
+    while multiprocessing.active_children() and time.time() < deadline:
+        time.sleep(0.05)
+    assert not multiprocessing.active_children()
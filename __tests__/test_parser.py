@@ -19,3 +19,31 @@ def test_program_parser():
     assert prolog("9.0") == 9.0
     assert prolog('"hi"') == "hi"
     # assert prolog("foo(X) :- bar(X).") == KnowledgeBase([foo(x) <= bar(x)])
+
+
+def test_lalr_parser():
+    x = Variable("X")
+    foo = functor('foo')
+
+    assert prolog("true") == YES
+    assert prolog("fail") == NO
+    assert prolog("true(X)") == Term("true", (x,))
+    assert prolog("not(foo(X))") == Not(foo(x))
+    assert prolog("foo(X). foo(X) :- !.") == [foo(x), foo(x) <= CUT]
+    assert prolog("foo(X) :- bar(X), !, \\+ baz(X).") == [foo(x) <= Term("bar", (x,)) & CUT & Not(Term("baz", (x,)))]
+    assert prolog("[]") == ()
+
+
+def test_stream_prolog():
+    import io
+    from src.table import LinearTable
+
+    program = "edge(aa, bb). edge('hello world', cc).\npath(X, Y) :-\n  edge(X, Y).\n" \
+              "dynamic edge/2.\nsay(X) :- said(X).\n"
+    assert list(stream_prolog(io.StringIO(program), chunk_size=3)) == prolog(program)
+
+    assert list(stream_prolog(io.StringIO('"a. b". "c".'))) == ["a. b", "c"]
+
+    tb = LinearTable()
+    assert load_prolog(tb, io.StringIO(program), batch_size=2) == 4
+    assert len(tb.rules()) == 4
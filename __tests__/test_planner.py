@@ -0,0 +1,48 @@
+from src import *
+
+X, Y = variables("XY")
+big, small, answer = functor("big", 2), functor("small", 1), functor("answer", 2)
+
+tb = PlannedTable(LinearTable(
+    [big(Term(f"n{i}"), Term(f"m{i % 3}")) for i in range(30)] +
+    [small(Term("n4"))] +
+    [answer(X, Y) <= big(X, Y) & small(X)]
+))
+
+
+def test_statistics():
+    assert tb.cardinality["big", 2] == 30
+    assert [len(values) for values in tb.distinct["big", 2]] == [30, 3]
+    assert tb.estimate(big(X, Y), {X}) == 1
+    assert tb.estimate(big(X, Term("m1")), set()) == 10
+
+
+def test_reorders_body():
+    body = big(X, Y) & small(X)
+    assert tb.plan(body, set()) == small(X) & big(X, Y)
+    assert tb.plan(body, {X, Y}) == body
+    assert list(bc_ask(tb, answer(X, Y))) == [{X: Term("n4"), Y: Term("m1")}]
+
+
+def test_plans_cached_until_table_grows():
+    tb.plan(big(X, Y) & small(X), set())
+    assert tb.plans
+    tb.tell(small(Term("n5")))
+    assert not tb.plans
+
+
+def test_barriers():
+    member, first = functor("member", 2), functor("first", 1)
+    a, b, c = Term("a"), Term("b"), Term("c")
+    cut_tb = PlannedTable(LinearTable([
+        member(a, X), member(b, X), member(c, X),
+        first(Y) <= member(Y, X) & CUT,
+    ]))
+    assert list(bc_ask(cut_tb, first(Y))) == [{Y: a}]
+
+    body = big(X, Y) & CUT & small(X)
+    assert tb.plan(body, set()) == body
+    body = big(X, Y) & once(small(X))
+    assert tb.plan(body, set()) == body
+    body = big(X, Y) & ~small(X) & small(Y)
+    assert tb.plan(body, set()) == body
@@ -0,0 +1,60 @@
+from src import *
+
+X, Y, Z = variables("XYZ")
+edge = functor("edge", 2)
+path = functor("path", 2)
+a, b, c, d = Term("a"), Term("b"), Term("c"), Term("d")
+
+
+def network():
+    return ReteTable(LinearTable([
+        edge(a, b),
+        path(X, Y) <= edge(X, Y),
+        path(X, Y) <= edge(X, Z) & path(Z, Y),
+    ]))
+
+
+def test_derives_on_build():
+    assert list(bc_ask(network(), path(a, b), patience=0)) == [{}]
+
+
+def test_incremental():
+    tb = network()
+    derived = []
+    tb.subscribe(derived.append, path(a, X))
+    tb.tell(edge(b, c))
+    assert set(derived) == {path(a, c)}
+    tb.tell(edge(c, a))
+    tb.tell(edge(c, d))
+    assert set(derived) == {path(a, c), path(a, a), path(a, d)}
+    assert len(list(bc_ask(tb, path(X, Y), patience=0))) == 12
+
+
+def test_new_rule():
+    tb = network()
+    tb.tell(Term("linked", (X,)) <= path(X, Y))
+    assert list(bc_ask(tb, Term("linked", (X,)), patience=0)) == [{X: a}]
+    tb.tell(Term("start", (X,)) <= edge(X, b))
+    assert list(bc_ask(tb, Term("start", (X,)), patience=0)) == [{X: a}]
+
+
+def test_new_rule_joins_open_facts():
+    p, q, r, pair = functor("p", 1), functor("q", 1), functor("r", 1), functor("pair", 2)
+    tb = ReteTable(LinearTable([p(pair(X, a)), q(pair(b, X))]))  # stored numbered, so both Xs get id 0
+    tb.tell(r(Z) <= p(Z) & q(Z))
+    assert list(bc_ask(tb, r(Z), patience=0)) == [{Z: pair(b, a)}]
+
+
+def test_constraints_and_negations():
+    age, older, alone = functor("age", 2), functor("older", 2), functor("alone", 1)
+    A, B = variables("AB")
+    tb = ReteTable(LinearTable([
+        age(a, 20), age(b, 17), edge(a, c),
+        older(X, Y) <= age(X, A) & age(Y, B) & GT(A, B),
+        alone(X) <= ~edge(X, Y) & age(X, A),
+    ]))
+    assert list(bc_ask(tb, older(X, Y), patience=0)) == [{X: a, Y: b}]
+    assert list(bc_ask(tb, alone(X), patience=0)) == [{X: b}]
+    tb.tell(age(c, 30))
+    assert {(ans[X], ans[Y]) for ans in bc_ask(tb, older(X, Y), patience=0)} == {(a, b), (c, a), (c, b)}
+    assert list(bc_ask(tb, alone(X), patience=0)) == [{X: b}, {X: c}]
@@ -0,0 +1,51 @@
+import pickle
+
+from src import *
+
+edge, path = functor("edge", 2), functor("path", 2)
+X, Y, Z = variables("XYZ")
+
+RULES = [edge(i, i + 1) for i in range(100)] + [
+    edge(X, X),
+    edge(Term("f", (1,)), "a string"),
+    path(X, Y) <= edge(X, Y),
+    path(X, Y) <= edge(X, Z) & path(Z, Y),
+]
+
+
+def test_snapshot(tmp_path):
+    save_snapshot(HashTable(RULES), tmp_path / "kb")
+    tb = SnapshotTable(tmp_path / "kb")
+    assert list(tb.rules()) == list(HashTable(RULES).rules())
+
+    for query in [edge(5, X), edge(X, 5), edge(X, Y), edge(3, 3), edge(Term("f", (1,)), X), path(X, Y), edge(X, -1)]:
+        assert list(tb.fetch(query)) == list(HashTable(RULES).fetch(query))
+    assert list(tb.fetch(path(X, Y), conditional=False)) == []
+    assert take(5, bc_ask(tb, path(97, X))) == take(5, bc_ask(HashTable(RULES), path(97, X)))
+
+
+def test_snapshot_lazy(tmp_path):
+    save_snapshot(HashTable(RULES), tmp_path / "kb")
+    tb = SnapshotTable(tmp_path / "kb")
+    list(tb.fetch(edge(5, X)))
+    assert len(tb._decoded) == 2  # edge(5, 6) and edge(X, X)
+
+
+def test_snapshot_tell(tmp_path):
+    save_snapshot(LinearTable(RULES), tmp_path / "kb")
+    tb = SnapshotTable(tmp_path / "kb")
+    tb.tell(edge(200, 201))
+    assert list(bc_ask(tb, edge(200, X))) == [{X: 200}, {X: 201}]
+
+    copy = pickle.loads(pickle.dumps(tb))
+    assert list(bc_ask(copy, edge(200, X))) == [{X: 200}, {X: 201}]
+    assert list(bc_ask(copy, edge(5, X))) == [{X: 6}, {X: 5}]
+
+
+def test_snapshot_numbers(tmp_path):
+    p = functor("p", 2)
+    save_snapshot(HashTable([p(1, 2), p(Term("f", (2.5,)), 3), p(True, 4)]), tmp_path / "kb")
+    with SnapshotTable(tmp_path / "kb") as tb:
+        assert list(bc_ask(tb, p(1.0, X))) == [{X: 2}, {X: 4}]
+        assert list(bc_ask(tb, p(Term("f", (2.5,)), X))) == [{X: 3}]
+    assert tb._mmap.closed
@@ -36,3 +36,50 @@ t = TrieTable
 print(list(
     TrieTable(foo.rules()).rules()
 ))
+test_hash = howto_test(HashTable(foo.rules()))
+
+
+def test_hash_intersection():
+    tb = HashTable([father(Leo, Milo), father(Leo, Declan), father(Henry, Milo), father(x, x) <= sibling(x, x)])
+    assert list(tb.fetch(father(Leo, Milo))) == [father(Leo, Milo) <= language.YES]
+    assert list(tb.fetch(father(Milo, Milo))) == [father(Anything, Anything) <= Anything]
+    assert list(tb.fetch(father(Henry, y), conditional=False)) == [father(Henry, Milo) <= language.YES]
+    assert list(tb.fetch(father(y, y), conditional=False)) == []
+    before = (dict(tb.index[("father", 2)][0]), dict(tb.index[("father", 2)][1]))
+    assert list(tb.fetch(father(Term("nobody"), y))) == [father(Anything, Anything) <= Anything]
+    assert list(tb.fetch(sibling(Leo, Milo))) == []
+    assert (dict(tb.index[("father", 2)][0]), dict(tb.index[("father", 2)][1])) == before
+
+
+def test_tell_many():
+    rules = [father(Leo, Milo), father(Henry, Leo), father(x, y) <= sibling(y, x), sibling(Milo, Declan), father(x, x)]
+    for factory in [LinearTable, TrieTable, HashTable, PredicateIndex]:
+        one_by_one = factory()
+        for rule in rules:
+            one_by_one.tell(rule)
+        bulk = factory()
+        bulk.tell_many(iter(rules))
+        assert list(bulk.rules()) == list(one_by_one.rules())
+        for query in [father(Leo, y), father(y, Leo), father(x, y), sibling(x, y)]:
+            assert list(bulk.fetch(query)) == list(one_by_one.fetch(query))
+
+
+def test_range_index():
+    price, cheap = functor("price", 2), functor("cheap", 1)
+    tb = RangeIndex([price(Term(f"item{i}"), i) for i in range(100)] + [price(Term("sale"), x), price(Leo, Leo)])
+    in_range = tb.fetch_range(price(y, x), {1: Interval(3, 5, lo_strict=True)})
+    assert [rule.args[1] for rule in in_range] == [4, 5, Anything]
+    tb.tell(price(Milo, 4.5))
+    assert [rule.args[1] for rule in tb.fetch_range(price(y, x), {1: Interval(4, 5)})] == [4, 5, Anything, 4.5]
+    assert list(tb.fetch_range(price(Term("item7"), x), {1: Interval(hi=10)})) == [price(Term("item7"), 7) <= YES]
+
+    tb.tell(cheap(y) <= price(y, x) & LE(x, 2))
+    assert repr(tb.pushdown(price(y, x) & LE(x, 2))) == repr(LE(x, 2) & price(y, x))
+    assert repr(tb.pushdown(price(y, x) & CUT & LE(x, 2))) == repr(price(y, x) & CUT & LE(x, 2))
+    with Tracer() as tracer:
+        # sale's price is never bound, so LE(x, 2) stays suspended and it isn't an answer
+        assert [ans[y] for ans in bc_ask(tb, cheap(y))] == [Term("item0"), Term("item1"), Term("item2")]
+    assert tracer.predicates["price/2"].candidates == 4
+
+    flags = RangeIndex([price(Leo, True), price(Milo, 1), cheap(y) <= price(y, x) & LE(x, 2)])
+    assert list(bc_ask(flags, cheap(y))) == list(bc_ask(HashTable(flags.rules()), cheap(y))) == [{y: Milo}]
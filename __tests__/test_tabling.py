@@ -0,0 +1,42 @@
+from src import *
+
+X, Y, Z = variables("XYZ")
+edge = functor("edge", 2)
+path = functor("path", 2)
+a, b, c, d = Term("a"), Term("b"), Term("c"), Term("d")
+
+cycle = [
+    edge(a, b),
+    edge(b, c),
+    edge(c, a),
+    edge(c, d),
+    path(X, Y) <= path(X, Z) & edge(Z, Y),  # left recursive
+    path(X, Y) <= edge(X, Y),
+]
+
+
+def test_variant():
+    assert variant(path(X, Y)) == variant(path(Y, Z))
+    assert variant(path(X, X)) != variant(path(X, Y))
+    assert variant(path(a, X)) != variant(path(b, X))
+
+
+def test_terminates_on_cycles():
+    tb = TabledTable(LinearTable(cycle))
+    assert sorted(str(ans[Y]) for ans in bc_ask(tb, path(a, Y))) == ["a", "b", "c", "d"]
+    assert len(list(bc_ask(tb, path(X, Y)))) == 12
+    assert list(bc_ask(tb, path(d, Y))) == []
+    assert list(bc_ask(tb, path(a, d))) == [{}]
+
+
+def test_per_predicate():
+    tb = TabledTable(HashTable(cycle), predicates=["path"])
+    assert not tb.tabled(edge(a, X))
+    assert len(list(bc_ask(tb, path(X, Y)))) == 12
+
+
+def test_tell_clears_tables():
+    tb = TabledTable(LinearTable(cycle))
+    assert list(bc_ask(tb, path(d, Y))) == []
+    tb.tell(edge(d, a))
+    assert len(list(bc_ask(tb, path(d, Y)))) == 4
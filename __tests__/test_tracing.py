@@ -0,0 +1,36 @@
+from src import *
+from src import tracing
+
+edge, path = functor("edge", 2), functor("path", 2)
+X, Y, Z = variables("XYZ")
+a, b, c = Term("a"), Term("b"), Term("c")
+
+tb = HashTable([
+    edge(a, b), edge(b, c),
+    path(X, Y) <= edge(X, Y),
+    path(X, Y) <= edge(X, Z) & path(Z, Y),
+])
+
+
+def test_tracer():
+    with Tracer() as tracer:
+        answers = list(bc_ask(tb, path(a, X)))
+    assert tracing.active is None
+    assert answers == [{X: b}, {X: c}]
+
+    stats = tracer.predicates["path/2"]
+    assert (stats.calls, stats.candidates, stats.matched, stats.answers) == (3, 6, 6, 3)
+    assert sum(clause.answers for clause in stats.clauses.values()) == 3
+    assert tracer.predicates["edge/2"].clauses["fact"].tried == 4
+    assert tracer.max_depth == 4
+    assert "path/2" in tracer.report()
+
+    stacks = dict(line.rsplit(" ", 1) for line in tracer.folded().splitlines())
+    assert "path/2;path/2;edge/2" in stacks
+
+
+def test_untraced():
+    with Tracer() as tracer:
+        pass
+    list(bc_ask(tb, path(a, X)))
+    assert not tracer.predicates
@@ -21,3 +21,31 @@ def test_tuple():
 #     assert unify((1, 2), (x, 2, +y)) == {x: 1, y: ()}
 #     assert unify((1, +x, 3), (1, 2, 3)) == FAIL
 #     assert unify((+x, y), (1, 2)) == FAIL
+
+
+def test_trail():
+    x, y, z = variables("xyz")
+    trail = Trail({z: 0})
+    mark = trail.checkpoint()
+    assert trail.unify((1, y), (x, 2))
+    assert trail.to_dict() == {x: 1, y: 2, z: 0}
+    assert not trail.unify(x, 3)
+    assert trail.to_dict() == {x: 1, y: 2, z: 0}
+    trail.rollback(mark)
+    assert trail.to_dict() == {z: 0}
+
+
+def test_resolve():
+    x, y = variables("xy")
+    foo = functor("foo")
+    assert resolve(foo(x, (y, 1)), {x: y, y: foo(2)}) == foo(foo(2), (foo(2), 1))
+    assert unify(x, foo(x)) == NO
+
+
+def test_unify_renamed():
+    x, y = Variable("X", 0), Variable("Y", 1)
+    foo = functor("foo")
+    trail = Trail()
+    assert unify_renamed(foo(x, foo(y)), 10, foo(1, Variable("Z")), trail)
+    assert trail.to_dict() == {Variable("X", 10): 1, Variable("Z"): foo(Variable("Y", 11))}
+    assert resolve(foo(y, x), trail, 10) == foo(Variable("Y", 11), 1)
@@ -0,0 +1,7 @@
+"""Benchmarks for the tables, inference, parser and unification
+
+Run `python -m benchmarks` from the repository root to run them all and compare them with baseline.json, or
+`python -m benchmarks fetch/` to run the ones whose names contain "fetch/". The exit status is 1 if any benchmark got
+slower than the baseline by more than the tolerance. Timings depend on the machine, so record a baseline with
+`--save-baseline` on the machine you compare on (baseline.json says which machine it came from).
+"""
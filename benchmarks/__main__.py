@@ -0,0 +1,47 @@
+import argparse
+import sys
+from pathlib import Path
+
+from benchmarks import harness, suite  # noqa: F401, importing suite registers the benchmarks
+
+BASELINE = Path(__file__).parent / "baseline.json"
+
+
+def main(argv=None) -> int:
+    arg_parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Runs the benchmarks and compares them with a stored baseline, exiting with 1 on a regression",
+    )
+    arg_parser.add_argument("pattern", nargs="?", default="", help="only run benchmarks whose name contains this")
+    arg_parser.add_argument("--output", "-o", help="write the results to this JSON file")
+    arg_parser.add_argument("--baseline", "-b", default=str(BASELINE), help="JSON file to compare against")
+    arg_parser.add_argument("--save-baseline", action="store_true", help="write the results to the baseline file")
+    arg_parser.add_argument("--tolerance", "-t", type=float, default=1.0,
+                            help="how much slower than the baseline counts as a regression, default 1.0 (2x)")
+    arg_parser.add_argument("--floor", type=float, default=10e-6,
+                            help="seconds slower a benchmark must also get to count, default 10e-6 (10 us)")
+    arg_parser.add_argument("--repeat", "-r", type=int, default=5, help="samples per benchmark, default 5")
+    arg_parser.add_argument("--min-time", type=float, default=0.05, help="seconds per sample, default 0.05")
+    args = arg_parser.parse_args(argv)
+
+    results = harness.run(args.pattern, repeat=args.repeat, min_time=args.min_time, log=sys.stderr)
+    if args.output:
+        harness.save(results, args.output)
+    if args.save_baseline:
+        harness.save(results, args.baseline)
+        return 0
+
+    if not Path(args.baseline).exists():
+        print(f"no baseline at {args.baseline}, run with --save-baseline to make one", file=sys.stderr)
+        return 0
+
+    baseline = harness.load(args.baseline)
+    harness.report(results, baseline)
+    regressions = harness.compare(results, baseline, args.tolerance, args.floor)
+    for name, ratio in regressions:
+        print(f"REGRESSION {name}: {ratio:.2f}x the baseline", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
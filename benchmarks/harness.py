@@ -0,0 +1,158 @@
+import gc
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import typing
+
+SEED = 2021
+"""every benchmark gets its own random.Random seeded with this, so the data is the same on every run"""
+
+TYPE_BENCHMARK = typing.Callable[..., typing.Callable[[], typing.Any]]
+
+_registry: typing.Dict[str, typing.Tuple[TYPE_BENCHMARK, dict]] = {}
+
+
+def benchmark(group: str, **grid: typing.Iterable):
+    """Registers a benchmark, once for every combination of the parameters in grid
+
+    The decorated function takes a seeded `random.Random` and the parameters, does its setup, and returns a function
+    of no arguments which does the work to time. Each combination gets a name like `group/function[a=1,b=2]`.
+    """
+    def decorator(func: TYPE_BENCHMARK) -> TYPE_BENCHMARK:
+        combos = [{}]
+        for key, values in grid.items():
+            combos = [dict(combo, **{key: value}) for combo in combos for value in values]
+        for params in combos:
+            label = ",".join(f"{key}={value}" for key, value in params.items())
+            name = f"{group}/{func.__name__}" + (f"[{label}]" if label else "")
+            _registry[name] = (func, params)
+        return func
+    return decorator
+
+
+def measure(work: typing.Callable[[], typing.Any], repeat: int, min_time: float) -> typing.List[float]:
+    """Times work, calling it as many times per sample as it takes to fill min_time, returning seconds per call
+
+    work is called once first without being timed, so caches and lazily built indexes don't count against it. As in
+    `timeit`, the garbage collector is off while timing, so collections of what earlier benchmarks left behind don't
+    land on this one.
+    """
+    work()
+    gc.collect()
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        number = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(number):
+                work()
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time or number >= 1 << 20:
+                break
+            number *= 2
+
+        samples = [elapsed / number]
+        for _ in range(repeat - 1):
+            start = time.perf_counter()
+            for _ in range(number):
+                work()
+            samples.append((time.perf_counter() - start) / number)
+        return samples
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _reference() -> int:
+    """a fixed loop, timed next to every benchmark to tell how fast the machine happens to be running just then"""
+    total = 0
+    for i in range(1000):
+        total += i
+    return total
+
+
+def run(pattern: str = "", repeat: int = 5, min_time: float = 0.05,
+        log: typing.Optional[typing.TextIO] = None) -> dict:
+    """Runs every registered benchmark whose name contains pattern, returning the results"""
+    results = {}
+    for name, (func, params) in _registry.items():
+        if pattern not in name:
+            continue
+        work = func(random.Random(SEED), **params)
+        before = measure(_reference, repeat, min_time / 5)
+        samples = measure(work, repeat, min_time)
+        after = measure(_reference, repeat, min_time / 5)
+        results[name] = {
+            "median": statistics.median(samples),
+            "min": min(samples),
+            "reference": min(before + after),
+            "samples": len(samples),
+            "params": params,
+        }
+        if log:
+            print(f"{name:70} {results[name]['min'] * 1e6:12.1f} us", file=log)
+
+    return {
+        "machine": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+        },
+        "seed": SEED,
+        "results": results,
+    }
+
+
+def _fastest(result: dict) -> float:
+    """the fastest sample, which other processes on the machine can only slow down, so it is the steadiest measure"""
+    return result.get("min", result["median"])
+
+
+def _ratio(new: dict, old: dict) -> float:
+    """how many times slower new is than old, in units of the reference loop timed next to each where both have it"""
+    ratio = _fastest(new) / _fastest(old)
+    if new.get("reference") and old.get("reference"):
+        ratio *= old["reference"] / new["reference"]
+    return ratio
+
+
+def compare(results: dict, baseline: dict, tolerance: float = 1.0,
+            floor: float = 10e-6) -> typing.List[typing.Tuple[str, float]]:
+    """Finds the benchmarks whose fastest sample got more than tolerance slower than in the baseline
+
+    Times are taken relative to the reference loop run next to each benchmark, so a machine that is busier or slower
+    overall doesn't show as regressions. Even so separate runs differ by up to about 1.7x, so the default only flags
+    benchmarks that got twice as slow, and slowdowns of less than floor seconds aren't counted at all. Returns (name,
+    ratio of new to old time) pairs, worst first. Benchmarks missing from either side are ignored.
+    """
+    regressions = []
+    for name, result in results["results"].items():
+        old = baseline["results"].get(name)
+        if old and _fastest(old) > 0:
+            ratio = _ratio(result, old)
+            if (ratio > 1 + tolerance) and (_fastest(result) - _fastest(old) > floor):
+                regressions.append((name, ratio))
+    return sorted(regressions, key=lambda r: -r[1])
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def save(results: dict, path: str) -> None:
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def report(results: dict, baseline: dict, out: typing.TextIO = sys.stdout) -> None:
+    """Prints each benchmark's fastest sample, and how many times slower than the baseline it is (see `compare`)"""
+    for name, result in results["results"].items():
+        old = baseline["results"].get(name)
+        change = f"{_ratio(result, old):6.2f}x" if old and _fastest(old) > 0 else "   new"
+        print(f"{name:70} {_fastest(result) * 1e6:12.1f} us {change}", file=out)
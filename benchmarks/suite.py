@@ -0,0 +1,200 @@
+"""The benchmarks, adapted from the notebooks in experiments/"""
+import io
+import itertools
+import random
+
+from src import *
+
+from benchmarks.harness import benchmark
+
+TABLES = {
+    "linear": LinearTable,
+    "trie": TrieTable,
+    "hash": HashTable,
+    "predicate": PredicateIndex,
+}
+
+
+# table fetch scaling, from experiments/indexing.ipynb
+
+def make_term(rng: random.Random, arity: int, n_unique: int) -> Term:
+    return Term(str(rng.randint(0, n_unique)), tuple(Term(str(rng.randint(0, n_unique))) for _ in range(arity)))
+
+
+def fetch_work(rng: random.Random, table: str, rows: int, arity: int, n_unique: int):
+    tb = TABLES[table]([make_term(rng, arity, n_unique) for _ in range(rows)])
+    queries = itertools.cycle([make_term(rng, arity, n_unique) for _ in range(100)])
+    return lambda: list(tb.fetch(next(queries)))
+
+
+@benchmark("fetch", table=TABLES, rows=[100, 1000, 10000])
+def fetch_rows(rng, table, rows):
+    return fetch_work(rng, table, rows, arity=3, n_unique=10)
+
+
+@benchmark("fetch", table=TABLES, arity=[1, 5, 20])
+def fetch_arity(rng, table, arity):
+    return fetch_work(rng, table, rows=1000, arity=arity, n_unique=10)
+
+
+@benchmark("fetch", table=TABLES, n_unique=[1, 10, 100])
+def fetch_unique(rng, table, n_unique):
+    return fetch_work(rng, table, rows=1000, arity=3, n_unique=n_unique)
+
+
+@benchmark("tell", table=TABLES, bulk=[False, True])
+def tell_rows(rng, table, bulk):
+    facts = [make_term(rng, 3, 100) for _ in range(10000)]
+
+    def work():
+        tb = TABLES[table]()
+        if bulk:
+            tb.tell_many(facts)
+        else:
+            for fact in facts:
+                tb.tell(fact)
+    return work
+
+
+# inference on random graphs, from experiments/random_graphs.ipynb
+
+edge, path = functor("edge", 2), functor("path", 2)
+X, Y, Z = variables("XYZ")
+
+
+def random_graph(rng: random.Random, n_nodes: int, n_edges: int) -> list:
+    return [
+        path(X, Y) <= edge(X, Y),
+        path(X, Y) <= edge(X, Z) & path(Z, Y),
+    ] + [edge(Term(f"node_{rng.randint(0, n_nodes)}"), Term(f"node_{rng.randint(0, n_nodes)}"))
+         for _ in range(n_edges)]
+
+
+ASKS = {
+    "bc": lambda tb, query: bc_ask(tb, query, patience=10),
+    "fc": fc_ask,
+    "id": lambda tb, query: id_ask(tb, query, patience=10),
+}
+
+
+@benchmark("inference", ask=ASKS, nodes=[5, 10, 20])
+def path_search(rng, ask, nodes):
+    """the first answer (if any) to whether there is a path between random nodes, like the notebook"""
+    graphs = []
+    for _ in range(10):
+        rules = random_graph(rng, nodes, nodes)
+        a, b = Term(f"node_{rng.randint(0, nodes)}"), Term(f"node_{rng.randint(0, nodes)}")
+        graphs.append((rules, path(a, b)))
+
+    def work():
+        for rules, query in graphs:
+            next(ASKS[ask](LinearTable(rules), query), None)
+    return work
+
+
+@benchmark("inference", nodes=[20, 40])
+def fc_closure(rng, nodes):
+    rules = random_graph(rng, nodes, 2 * nodes)
+    return lambda: list(fc_ask(LinearTable(rules), path(X, Y)))
+
+
+@benchmark("inference", nodes=[10, 20])
+def tabled_closure(rng, nodes):
+    rules = random_graph(rng, nodes, 2 * nodes)
+    return lambda: list(bc_ask(TabledTable(HashTable(rules)), path(X, Y)))
+
+
+@benchmark("inference", ask=["bc", "iterative"], depth=[200])
+def deep_chain(rng, ask, depth):
+    """every node reachable from the start of a chain, so answers come from ever deeper proofs"""
+    nodes = [Term(f"node_{i}") for i in range(depth + 1)]
+    tb = HashTable([edge(nodes[i], nodes[i + 1]) for i in range(depth)] + [
+        path(X, X) <= YES,
+        path(X, Y) <= edge(X, Z) & path(Z, Y),
+    ])
+    solve = bc_ask if ask == "bc" else bc_ask_iterative
+    return lambda: list(solve(tb, path(nodes[0], Y)))
+
+
+RANGE_TABLES = {"hash": HashTable, "range": RangeIndex}
+
+
+@benchmark("inference", table=RANGE_TABLES, rows=[1000, 10000])
+def range_query(rng, table, rows):
+    """the rows under a price, which the range index fetches without scanning the rest"""
+    price, cheap = functor("price", 2), functor("cheap", 1)
+    tb = RANGE_TABLES[table]([price(Term(f"item_{i}"), rng.randint(0, rows)) for i in range(rows)] + [
+        cheap(X) <= price(X, Y) & LE(Y, 10),
+    ])
+    return lambda: list(bc_ask(tb, cheap(X)))
+
+
+# parser throughput
+
+def program(rng: random.Random, n_facts: int) -> str:
+    facts = "".join(f"edge(node{rng.randint(0, n_facts)}, node{rng.randint(0, n_facts)}).\n" for _ in range(n_facts))
+    return facts + "path(X, Y) :- edge(X, Y).\npath(X, Y) :- edge(X, Z), path(Z, Y).\n"
+
+
+@benchmark("parser", n_facts=[1000])
+def parse_program(rng, n_facts):
+    text = program(rng, n_facts)
+    return lambda: prolog(text)
+
+
+@benchmark("parser", n_facts=[1000])
+def stream_program(rng, n_facts):
+    text = program(rng, n_facts)
+    return lambda: list(stream_prolog(io.StringIO(text)))
+
+
+@benchmark("parser")
+def parse_rule(rng):
+    return lambda: prolog("grandparent(X, Z) :- parent(X, Y), parent(Y, Z); step(X, Z)")
+
+
+# unification
+
+def nested(depth: int, leaf):
+    term = leaf
+    for i in range(depth):
+        term = Term("f", (term, Term(f"c{i}")))
+    return term
+
+
+@benchmark("unification", depth=[1, 10, 50])
+def unify_nested(rng, depth):
+    ground, open_ = nested(depth, Term("leaf")), nested(depth, X)
+    return lambda: unify(ground, open_)
+
+
+@benchmark("unification", depth=[10])
+def unify_fail(rng, depth):
+    x, y = nested(depth, Term("a")), nested(depth, Term("b"))
+    return lambda: unify(x, y)
+
+
+@benchmark("unification", depth=[10])
+def trail_rollback(rng, depth):
+    ground, open_ = nested(depth, Term("leaf")), nested(depth, X)
+    trail = Trail()
+
+    def work():
+        mark = trail.checkpoint()
+        trail.unify(ground, open_)
+        trail.rollback(mark)
+    return work
+
+
+@benchmark("unification", depth=[10])
+def resolve_bound(rng, depth):
+    vs = [Variable("V", i) for i in range(depth)]
+    term = Term("f", tuple(vs))
+    binding = {v: Term(f"c{i}") for i, v in enumerate(vs)}
+    return lambda: resolve(term, binding)
+
+
+@benchmark("unification")
+def standardize_rule(rng):
+    rule = path(X, Y) <= edge(X, Z) & path(Z, Y)
+    return lambda: language.standardize(rule)
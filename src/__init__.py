@@ -4,3 +4,14 @@ from src.unification import *
 from src.parser import *
 from src.table import *
 from src.constraints import *
+from src.compiler import *
+from src.tabling import *
+from src.rete import *
+from src.columnar import *
+from src.planner import *
+from src.negation import *
+from src.parallel import *
+from src.aio import *
+from src.snapshot import *
+from src.tracing import Tracer
+from src.machine import *
@@ -0,0 +1,90 @@
+import asyncio
+import inspect
+import typing
+
+from src import language, unification, table, constraints, inference, machine
+
+TYPE_ASYNC_BINDINGS = typing.AsyncIterator[typing.Mapping[language.Variable, typing.Any]]
+
+
+class _Clock:
+    """Counts resolution steps, handing control back to the event loop every so many of them"""
+    def __init__(self, every: int):
+        self.every = every
+        self.steps = 0
+
+    async def tick(self) -> None:
+        self.steps += 1
+        if self.steps % self.every == 0:
+            await asyncio.sleep(0)
+
+
+async def _aiter(iterable):
+    for item in iterable:
+        yield item
+
+
+async def _satisfying(goal: constraints.Constraint, binding: unification.Trail):
+    """the bindings under which a constraint holds, whether its test is a function, coroutine, or async generator"""
+    satisfying = goal.test(binding)
+    if inspect.isawaitable(satisfying):
+        satisfying = await satisfying
+    if not hasattr(satisfying, "__aiter__"):
+        satisfying = _aiter(satisfying)
+    async for extension in satisfying:
+        yield extension
+
+
+async def _drive(steps, clock: _Clock):
+    """runs a search with effects (see `inference._Effect`), awaiting them, and yields its answers"""
+    sent = None
+    while True:
+        try:
+            item = steps.send(sent)
+        except StopIteration:
+            return
+        sent = None
+        if item is inference._TICK:
+            await clock.tick()
+        elif isinstance(item, inference._Satisfy):
+            sent = [extension async for extension in _satisfying(item.goal, item.binding)]
+        else:
+            yield item
+
+
+async def bc_ask_async(tb: table.AbstractTable, query: language.Term, patience=float("inf"),
+                       every: int = 100, first_only: bool = False) -> TYPE_ASYNC_BINDINGS:
+    """Uses backward chaining to derive query from kb, as an async iterator
+
+    Works like `inference.bc_ask`, but hands control back to the event loop every `every` resolution steps, so a long
+    proof doesn't block other tasks. Nothing is computed until an answer is asked for, and cancelling the task
+    consuming the iterator stops the search at its next step. Constraints may have coroutines or async generators for
+    their `.test()`, which are awaited, an async generator being read to its end before the search goes on. The
+    search itself is the goal stack of `machine.bc_ask_iterative`.
+    """
+    steps = machine._run(tb, ((query, None, patience, 0), None), unification.Trail())
+    async for ans in _drive(steps, _Clock(every)):
+        if inference._settled(ans):
+            yield inference.relevant(query, ans)
+            if first_only:
+                return
+
+
+async def fc_ask_async(tb: table.AbstractTable, query: language.Term, every: int = 100) -> TYPE_ASYNC_BINDINGS:
+    """Uses forward chaining to derive query from kb, as an async iterator
+
+    The async counterpart of `inference.fc_ask`, see `bc_ask_async`. Answers found in a round are only yielded once
+    the round is over, but the event loop still gets control every `every` steps while it runs.
+    """
+    async for ans in _drive(inference._forward(tb, query), _Clock(every)):
+        yield ans
+
+
+async def id_ask_async(tb: table.AbstractTable, query: language.Term, patience=float("inf"),
+                       every: int = 100) -> TYPE_ASYNC_BINDINGS:
+    """Uses iterative deepening search to derive query, as an async iterator
+
+    The async counterpart of `inference.id_ask`, see `bc_ask_async`.
+    """
+    async for ans in _drive(inference._levels(tb, query, patience), _Clock(every)):
+        yield ans
@@ -0,0 +1,204 @@
+import typing
+from collections import defaultdict
+
+from src import language, unification, table
+
+np = None
+"""numpy, which is optional and only imported once a `ColumnStore` is made, so importing src doesn't load it"""
+
+
+def _numpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("ColumnStore needs numpy, install it with `pip install numpy` or the columnar extra")\
+                from None
+        np = numpy
+    return np
+
+
+def _join(left_vars: list, left: "np.ndarray", right_vars: list, right: "np.ndarray"):
+    """equi-joins two relations on the variables they share, by sorting the right one and searching it"""
+    shared = [var for var in right_vars if var in left_vars]
+    extra = [i for i, var in enumerate(right_vars) if var not in left_vars]
+    out_vars = left_vars + [right_vars[i] for i in extra]
+    if not (len(left) and len(right)):
+        return out_vars, np.zeros((0, len(out_vars)), dtype=np.int64)
+
+    if shared:
+        keys = np.concatenate([
+            left[:, [left_vars.index(var) for var in shared]],
+            right[:, [right_vars.index(var) for var in shared]],
+        ])
+        _, inverse = np.unique(keys, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        left_key, right_key = inverse[:len(left)], inverse[len(left):]
+    else:
+        left_key, right_key = np.zeros(len(left), dtype=np.int64), np.zeros(len(right), dtype=np.int64)
+
+    order = np.argsort(right_key, kind="stable")
+    sorted_key = right_key[order]
+    lo = np.searchsorted(sorted_key, left_key, side="left")
+    counts = np.searchsorted(sorted_key, left_key, side="right") - lo
+
+    left_index = np.repeat(np.arange(len(left)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    right_index = order[np.repeat(lo, counts) + offsets]
+    return out_vars, np.hstack([left[left_index], right[right_index][:, extra]])
+
+
+class ColumnStore:
+    """Stores ground facts as NumPy columns of interned ids, for evaluating conjunctive queries a relation at a time
+
+    Every atom appearing in a fact is interned to an integer, and the facts of each predicate are kept as an
+    (n_facts, arity) integer array. `.solve()` evaluates an `And` of terms left to right, selecting the rows of each
+    predicate which match its constants and joining them with the bindings so far by sort and binary search. Only the
+    facts are used: rules are not, so derive what you need first (e.g. with `fc_ask`). Needs numpy.
+
+    Arguments:
+        facts: ground terms (or rules with YES bodies) to store
+    """
+    def __init__(self, facts: typing.Iterable[typing.Union[language.Term, language.Rule]] = ()):
+        _numpy()
+        self.atoms: typing.List[typing.Any] = []
+        self.ids: typing.Dict[typing.Any, int] = {}
+        self.relations: typing.Dict[typing.Tuple[str, int], "np.ndarray"] = {}
+        self.pending: typing.Dict[typing.Tuple[str, int], typing.List[tuple]] = defaultdict(list)
+
+        for fact in facts:
+            self.tell(fact)
+
+    @classmethod
+    def from_table(cls, tb: table.AbstractTable) -> "ColumnStore":
+        return cls(tb.facts())
+
+    def intern(self, atom) -> int:
+        if atom not in self.ids:
+            self.ids[atom] = len(self.atoms)
+            self.atoms.append(atom)
+        return self.ids[atom]
+
+    def tell(self, fact: typing.Union[language.Term, language.Rule]) -> None:
+        if isinstance(fact, language.Rule):
+            if fact.body != language.YES:
+                raise ValueError("only facts can be stored in a ColumnStore")
+            fact = fact.head
+        if not language.is_ground(fact):
+            raise ValueError(f"{fact} is not ground")
+        self.pending[fact.op, len(fact.args)].append(tuple(self.intern(arg) for arg in fact.args))
+
+    def relation(self, op: str, arity: int) -> "np.ndarray":
+        """The array of facts for a predicate"""
+        key = (op, arity)
+        if self.pending.get(key):
+            rows = np.array(self.pending.pop(key), dtype=np.int64).reshape(-1, arity)
+            self.relations[key] = np.concatenate([self.relations[key], rows]) if key in self.relations else rows
+        return self.relations.get(key, np.zeros((0, arity), dtype=np.int64))
+
+    def _select(self, goal: language.Term):
+        """the rows of the goal's predicate which match it, with a column for each variable"""
+        if not isinstance(goal, language.Term):
+            raise ValueError(f"columnar evaluation can't handle {goal}")
+
+        data = self.relation(goal.op, len(goal.args))
+        mask = np.ones(len(data), dtype=bool)
+        columns: typing.Dict[language.Variable, int] = {}
+        for i, arg in enumerate(goal.args):
+            if isinstance(arg, language.Variable):
+                if arg in columns:
+                    mask &= data[:, i] == data[:, columns[arg]]
+                else:
+                    columns[arg] = i
+            elif not language.is_ground(arg):
+                raise ValueError(f"columnar evaluation can't handle {arg}, which has variables inside it")
+            elif arg in self.ids:
+                mask &= data[:, i] == self.ids[arg]
+            else:
+                mask[:] = False
+        return list(columns), data[mask][:, list(columns.values())]
+
+    def solve(self, query: language.Logical) -> typing.Tuple[typing.List[language.Variable], "np.ndarray"]:
+        """Evaluates a conjunction of terms, returning its variables and an array with a row of ids per answer"""
+        variables, rows = [], np.zeros((1, 0), dtype=np.int64)
+        for goal in language.And([query]):
+            goal_variables, goal_rows = self._select(goal)
+            variables, rows = _join(variables, rows, goal_variables, goal_rows)
+        return variables, rows
+
+    def ask(self, query: language.Logical, batch_size: int = 1000) -> typing.Iterator[typing.List[dict]]:
+        """Evaluates a conjunction of terms, yielding lists of up to batch_size bindings"""
+        variables, rows = self.solve(query)
+        for start in range(0, len(rows), batch_size):
+            yield [
+                {var: self.atoms[i] for var, i in zip(variables, row)}
+                for row in rows[start:start + batch_size].tolist()
+            ]
+
+
+class ColumnarTable(table.AbstractTable):
+    """Wraps a table, evaluating rule bodies over ground facts with a `ColumnStore`
+
+    The facts of extensional predicates, those with no rules and no facts with variables in them, are kept in a
+    ColumnStore as well as in the wrapped table. When a rule matches a goal, if its body with the head's bindings
+    substituted is a conjunction of two or more terms of extensional predicates, with only variables and ground
+    arguments, the whole body is solved as one columnar join. Each answer is yielded as bindings on the trail with
+    the body YES, so the engine doesn't prove the body a tuple at a time. Other bodies are passed through as they
+    are. Answers from a columnar body come in the order of the join rather than clause order, and its goals aren't
+    seen by a `tracing.Tracer`. Needs numpy.
+
+    Arguments:
+        table: a table to wrap
+    """
+    def __init__(self, table: table.AbstractTable):
+        self.table: table.AbstractTable = table
+        self.store = ColumnStore()
+        self.intensional: typing.Set[typing.Tuple[str, int]] = set()
+        self._add(table.rules())
+
+    def _add(self, rules: typing.Iterable[language.Rule]) -> None:
+        for rule in rules:
+            key = (rule.op, len(rule.args))
+            if (rule.body != language.YES) or not language.is_ground(rule.head):
+                self.intensional.add(key)
+            elif key not in self.intensional:
+                self.store.tell(rule.head)
+
+    def _extensional(self, goals: tuple) -> bool:
+        return all(isinstance(goal, language.Term) and (goal.op, len(goal.args)) not in self.intensional
+                   for goal in goals)
+
+    def match(self, query: language.Term, binding: unification.Trail,
+              conditional: bool = True) -> typing.Iterator[typing.Tuple[language.Logical, typing.Optional[int]]]:
+        for body, offset in self.table.match(query, binding, conditional=conditional):
+            goals = language.And([body]).args
+            if (len(goals) > 1) and self._extensional(goals):
+                goals = tuple(unification.resolve(goal, binding, offset) for goal in goals)
+                if all(isinstance(arg, language.Variable) or language.is_ground(arg)
+                       for goal in goals for arg in goal.args):
+                    variables, rows = self.store.solve(language.And(goals))
+                    for row in rows.tolist():
+                        mark = binding.checkpoint()
+                        if all(binding.unify(var, self.store.atoms[i]) for var, i in zip(variables, row)):
+                            yield language.YES, None
+                        binding.rollback(mark)
+                    continue
+            yield body, offset
+
+    def tell(self, rule: typing.Union[language.Term, language.Rule]) -> None:
+        if isinstance(rule, language.Term):
+            rule = language.Rule(rule, language.YES)
+        self.table.tell(rule)
+        self._add([rule])
+
+    def tell_many(self, rules: typing.Iterable[typing.Union[language.Term, language.Rule]]) -> None:
+        rules = [language.Rule(rule, language.YES) if isinstance(rule, language.Term) else rule for rule in rules]
+        self.table.tell_many(rules)
+        self._add(rules)
+
+    def fetch(self, query: language.Term, conditional: bool = True) -> typing.Iterator[language.Rule]:
+        return self.table.fetch(query, conditional=conditional)
+
+    def rules(self) -> typing.Iterable[language.Rule]:
+        return self.table.rules()
@@ -0,0 +1,216 @@
+import typing
+
+from src import language, unification, table, tracing
+
+
+def _variables(x) -> typing.List[language.Variable]:
+    """variables in x in the order they first appear, looking inside nested terms and lists"""
+    found = []
+
+    def _collect(thing):
+        if isinstance(thing, language.Variable):
+            if thing not in found:
+                found.append(thing)
+        elif isinstance(thing, language.Term):
+            for arg in thing.args:
+                _collect(arg)
+        elif isinstance(thing, tuple):
+            for item in thing:
+                _collect(item)
+        elif isinstance(thing, language.Join):
+            for arg in thing.args:
+                _collect(arg)
+        elif isinstance(thing, language.Not):
+            _collect(thing.item)
+        elif isinstance(thing, language.Logical):
+            for var in language.variables_in(thing):
+                _collect(var)
+
+    _collect(x)
+    return found
+
+
+class _PredicateCompiler:
+    """Writes the python source for the rules of one predicate"""
+    def __init__(self):
+        self.namespace = {
+            "Variable": language.Variable,
+            "Tail": language.Tail,
+            "Term": language.Term,
+            "And": language.And,
+            "Or": language.Or,
+            "Not": language.Not,
+            "unify_in": unification.unify_in,
+            "resolve": unification.resolve,
+            "fresh_id": language.fresh_id,
+        }
+        self.lines: typing.List[str] = []
+        self.depth = 0
+        self.slots: typing.Dict[language.Variable, str] = {}
+        self.numbers: typing.Dict[language.Variable, int] = {}
+        self.keys: typing.List[typing.Any] = []
+
+    def emit(self, line: str) -> None:
+        self.lines.append("    " * self.depth + line)
+
+    def constant(self, x) -> str:
+        name = f"k{len(self.namespace)}"
+        self.namespace[name] = x
+        return name
+
+    def declare(self, x) -> None:
+        """creates fresh variables for every variable in x that doesn't have a slot yet"""
+        for var in _variables(x):
+            if var not in self.slots:
+                self.slots[var] = f"v{len(self.slots)}"
+                cls = "Tail" if isinstance(var, language.Tail) else "Variable"
+                # each variable of the clause gets its own id from the block, as several can share a name
+                self.emit(f"{self.slots[var]} = {cls}({var.name!r}, _id + {self.numbers[var]})")
+
+    def expression(self, x) -> str:
+        """python expression rebuilding x out of constants and variable slots"""
+        if isinstance(x, language.Variable):
+            return self.slots[x]
+        elif not _variables(x):
+            return self.constant(x)
+        elif isinstance(x, language.Term):
+            return f"Term({x.op!r}, ({''.join(self.expression(arg) + ', ' for arg in x.args)}))"
+        elif isinstance(x, tuple):
+            return f"({''.join(self.expression(item) + ', ' for item in x)})"
+        elif isinstance(x, language.Join):
+            return f"{x.__class__.__name__}(({''.join(self.expression(arg) + ', ' for arg in x.args)}))"
+        elif isinstance(x, language.Not):
+            return f"Not({self.expression(x.item)})"
+        else:
+            renaming = ", ".join(f"{self.constant(var)}: {self.slots[var]}" for var in _variables(x))
+            return f"resolve({self.constant(x)}, {{{renaming}}})"
+
+    def clause(self, rule: language.Rule) -> None:
+        self.emit(f"def clause_{len(self.keys)}(args, trail, conditional):")
+        self.depth = base = 1
+        self.slots = {}
+        self.numbers = {var: i for i, var in enumerate(_variables((rule.head, rule.body)))}
+        # ground first arguments are used to pick which clauses to try
+        self.keys.append(rule.args[0] if rule.args and language.is_ground(rule.args[0]) else None)
+
+        self.emit(f"# {rule}")
+        self.emit("mark = trail.checkpoint()")
+        if rule.body != language.YES:
+            self.emit("if conditional:")
+            self.depth += 1
+        if self.numbers:
+            self.emit(f"_id = fresh_id({len(self.numbers)})")
+
+        for i, arg in enumerate(rule.args):
+            if isinstance(arg, language.Variable) and arg not in self.slots:
+                # the first time a head variable appears it can just take the query argument
+                self.slots[arg] = f"v{len(self.slots)}"
+                self.emit(f"{self.slots[arg]} = args[{i}]")
+                continue
+            elif isinstance(arg, language.Variable):
+                self.emit(f"if unify_in({self.slots[arg]}, args[{i}], trail):")
+            elif not _variables(arg):
+                k = self.constant(arg)
+                self.emit(f"if args[{i}] == {k} or unify_in(args[{i}], {k}, trail):")
+            else:
+                self.declare(arg)
+                self.emit(f"if unify_in(args[{i}], {self.expression(arg)}, trail):")
+            self.depth += 1
+
+        self.declare(rule.body)
+        self.emit(f"yield {self.expression(rule.body)}, None")
+        self.depth = base
+        self.emit("trail.rollback(mark)")
+        self.depth = 0
+
+    def compile(self, name: str) -> typing.Callable:
+        source = "\n".join(self.lines)
+        exec(compile(source, f"<compiled {name}>", "exec"), self.namespace)
+        clauses = [self.namespace[f"clause_{i}"] for i in range(len(self.keys))]
+
+        unindexed = [clause for clause, key in zip(clauses, self.keys) if key is None]
+        index = {
+            key: [clause for clause, other in zip(clauses, self.keys) if other in (key, None)]
+            for key in set(self.keys) if key is not None
+        }
+
+        def match(query, trail, conditional):
+            args, tracer = query.args, tracing.active
+            first = unification.walk(args[0], trail) if args else None
+            for clause in (index.get(first, unindexed) if language.is_ground(first) and index else clauses):
+                if tracer is not None:
+                    tracer.candidate(query)
+                for ans in clause(args, trail, conditional):
+                    yield ans
+
+        match.source = source
+        return match
+
+
+def compile_predicate(name: str, rules: typing.Iterable[language.Rule]) -> typing.Callable:
+    """Compiles rules sharing a functor and arity into a single generator function
+
+    Each rule becomes its own function, which unifies the arguments of a query with the rule head using code written
+    for that head, and yields the rule body with fresh variables (and None, as it needs no renaming), rolling the
+    `unification.Trail` back when resumed. The returned function picks which of them to run by the first argument of
+    the query, and takes the query, a trail and the `conditional` flag from `AbstractTable.fetch`. Each clause it
+    tries is counted as a candidate by an active `tracing.Tracer`. The source is kept on `.source`.
+    """
+    compiler = _PredicateCompiler()
+    for rule in rules:
+        compiler.clause(rule)
+    return compiler.compile(name)
+
+
+class CompiledTable(table.AbstractTable):
+    """Wraps a table, compiling the rules for each predicate into a specialised Python function
+
+    Every predicate in the table is compiled when the wrapper is created. Telling it a rule throws away the compiled
+    code for that predicate, which gets recompiled the next time the predicate is queried. Rules are tried in the
+    order the wrapped table fetches them.
+
+    Arguments:
+        table: a table to wrap
+    """
+    def __init__(self, table: table.AbstractTable):
+        self.table: table.AbstractTable = table
+        self.compiled: typing.Dict[typing.Tuple[str, int], typing.Callable] = {}
+        for rule in table.rules():
+            self.matcher(rule.op, len(rule.args))
+
+    def matcher(self, op: str, arity: int) -> typing.Callable:
+        """The compiled function for a predicate, compiling it if need be"""
+        try:
+            return self.compiled[op, arity]
+        except KeyError:
+            general = language.Term(op, tuple(language.Variable(f"_{i}") for i in range(arity)))
+            self.compiled[op, arity] = compile_predicate(f"{op}/{arity}", self.table.fetch(general))
+            return self.compiled[op, arity]
+
+    def tell(self, rule: typing.Union[language.Term, language.Rule]) -> None:
+        if isinstance(rule, language.Term):
+            rule = language.Rule(rule, language.YES)
+        self.table.tell(rule)
+        self.compiled.pop((rule.op, len(rule.args)), None)
+
+    def tell_many(self, rules: typing.Iterable[typing.Union[language.Term, language.Rule]]) -> None:
+        rules = list(rules)
+        self.table.tell_many(rules)
+        for rule in rules:
+            self.compiled.pop((rule.op, len(rule.args)), None)
+
+    def __getstate__(self):
+        # compiled code can't be pickled, it gets recompiled on the other side when needed
+        return {"table": self.table, "compiled": {}}
+
+    def fetch(self, query: language.Term, conditional: bool = True) -> typing.Iterator[language.Rule]:
+        return self.table.fetch(query, conditional=conditional)
+
+    def match(self, query: language.Term, binding: unification.Trail,
+              conditional: bool = True) -> typing.Iterator[typing.Tuple[language.Logical, typing.Optional[int]]]:
+        if not isinstance(query, language.Term):
+            return super().match(query, binding, conditional)
+        return self.matcher(query.op, len(query.args))(query, binding, conditional)
+
+    def rules(self) -> typing.Iterable[language.Rule]:
+        return self.table.rules()
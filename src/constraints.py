@@ -1,4 +1,9 @@
+import math
+import numbers
+import typing
 from abc import ABC, abstractmethod
+from dataclasses import dataclass, replace
+
 from src import unification, language
 
 
@@ -53,37 +58,221 @@ class Equals(Comparison):
             return []
 
 
-class LE(Comparison):
-    def test(self, binding: unification.TYPE_BINDING) -> unification.TYPE_BINDINGS:
-        x1, x2 = unification.value(self.x1, binding), unification.value(self.x2, binding)
-        if (language.FREE in [x1, x2]) or not (x1 <= x2):
-            return []
-        else:
-            return [binding]
+def _is_number(x) -> bool:
+    return isinstance(x, numbers.Real) and not isinstance(x, bool)
 
 
-class GE(Comparison):
-    def test(self, binding: unification.TYPE_BINDING) -> unification.TYPE_BINDINGS:
-        x1, x2 = unification.value(self.x1, binding), unification.value(self.x2, binding)
-        if (language.FREE in [x1, x2]) or not (x1 >= x2):
-            return []
-        else:
-            return [binding]
+@dataclass(frozen=True)
+class Interval:
+    """The numbers a variable can still take, from lo to hi, excluding a bound if it is strict
+
+    Integral intervals only hold whole numbers, and keep their bounds rounded to them.
+    """
+    lo: float = -math.inf
+    hi: float = math.inf
+    lo_strict: bool = False
+    hi_strict: bool = False
+    integral: bool = False
+
+    def empty(self) -> bool:
+        return (self.lo > self.hi) or ((self.lo == self.hi) and (self.lo_strict or self.hi_strict))
+
+    def __contains__(self, x) -> bool:
+        return _is_number(x) and ((not self.integral) or x == math.floor(x)) and \
+            ((self.lo < x) or (self.lo == x and not self.lo_strict)) and \
+            ((x < self.hi) or (x == self.hi and not self.hi_strict))
+
+    def rounded(self) -> "Interval":
+        """the interval with its bounds rounded to whole numbers inside it, if it is integral"""
+        if not self.integral:
+            return self
+        lo, hi = self.lo, self.hi
+        if math.isfinite(lo):
+            lo = math.floor(lo) + 1 if self.lo_strict else math.ceil(lo)
+        if math.isfinite(hi):
+            hi = math.ceil(hi) - 1 if self.hi_strict else math.floor(hi)
+        return Interval(lo, hi, False, False, True)
+
+    def below(self, hi, strict: bool) -> "Interval":
+        """the interval, with an upper bound of hi if that is tighter"""
+        if (hi < self.hi) or ((hi == self.hi) and strict and not self.hi_strict):
+            return replace(self, hi=hi, hi_strict=strict).rounded()
+        return self
+
+    def above(self, lo, strict: bool) -> "Interval":
+        """the interval, with a lower bound of lo if that is tighter"""
+        if (lo > self.lo) or ((lo == self.lo) and strict and not self.lo_strict):
+            return replace(self, lo=lo, lo_strict=strict).rounded()
+        return self
+
+    def intersect(self, other: "Interval") -> "Interval":
+        both = replace(self, integral=self.integral or other.integral).rounded()
+        return both.above(other.lo, other.lo_strict).below(other.hi, other.hi_strict)
 
 
-class LT(Comparison):
+@dataclass(frozen=True)
+class Suspension:
+    """The attribute of a variable on a `unification.Trail` which constraints have been suspended on
+
+    Holds the variable's domain and the constraints to wake when it is bound or its domain narrows.
+    """
+    domain: Interval = Interval()
+    constraints: tuple = ()
+
+    def wake(self, var: language.Variable, trail: unification.Trail) -> bool:
+        """checks var's new value against its domain and propagates its constraints, returning whether they hold"""
+        val = unification.walk(var, trail)
+        if isinstance(val, language.Variable):  # the variable it was bound to takes over
+            other = trail.attribute(val) or Suspension()
+            domain = other.domain.intersect(self.domain)
+            if domain.empty():
+                return False
+            trail.set_attribute(val, Suspension(domain, other.constraints + self.constraints))
+        elif val not in self.domain:
+            return False
+        return _propagate(self.constraints, trail)
+
+
+def _domain(x, trail: unification.Trail) -> typing.Optional[Interval]:
+    """the interval x can be in, or None if it isn't a number"""
+    x = unification.walk(x, trail)
+    if isinstance(x, language.Variable):
+        suspension = trail.attribute(x)
+        return Interval() if suspension is None else suspension.domain
+    elif _is_number(x):
+        return Interval(x, x)
+    return None
+
+
+def _narrow(x, domain: Interval, trail: unification.Trail, queue: list) -> bool:
+    """restricts x to domain, queueing the constraints to wake, returning False if nothing is left"""
+    if domain.empty():
+        return False
+    x = unification.walk(x, trail)
+    if isinstance(x, language.Variable):
+        suspension = trail.attribute(x) or Suspension()
+        if domain != suspension.domain:
+            trail.set_attribute(x, replace(suspension, domain=domain))
+            queue.extend(suspension.constraints)
+    return True
+
+
+def _propagate(constraints: typing.Iterable["Ordering"], trail: unification.Trail) -> bool:
+    """narrows domains until the constraints stop changing them, returning False if one becomes empty"""
+    queue = list(constraints)
+    while queue:
+        if not queue.pop().narrow(trail, queue):
+            return False
+    return True
+
+
+def _suspend(constraint: Constraint, trail: unification.Trail, x) -> None:
+    x = unification.walk(x, trail)
+    if isinstance(x, language.Variable):
+        suspension = trail.attribute(x) or Suspension()
+        trail.set_attribute(x, replace(suspension, constraints=suspension.constraints + (constraint,)))
+
+
+class Ordering(Comparison, ABC):
+    """A comparison of two numbers
+
+    When both sides have values the comparison is just tested, and fails unless both are numbers. On a
+    `unification.Trail`, if either side is unbound, the constraint is suspended instead: it is attached to the
+    unbound variables, which get interval domains (see `Interval`) narrowed by the comparison. Binding a variable
+    outside its domain fails unification, and narrowing a domain wakes the other constraints on the variable, so a
+    branch is pruned as soon as a domain becomes empty. Given a plain dict, a comparison with an unbound side fails,
+    as there is nowhere to suspend it.
+    """
+    strict = False
+
+    @abstractmethod
+    def holds(self, x1, x2) -> bool:
+        pass
+
+    @abstractmethod
+    def ordered(self) -> typing.Tuple[typing.Any, typing.Any]:
+        """the (smaller, larger) sides"""
+        pass
+
+    def narrow(self, trail: unification.Trail, queue: list) -> bool:
+        """narrows the domains of both sides, queueing the constraints this wakes"""
+        small, large = self.ordered()
+        a, b = _domain(small, trail), _domain(large, trail)
+        if (a is None) or (b is None):
+            return False
+        return _narrow(small, a.below(b.hi, b.hi_strict or self.strict), trail, queue) and \
+            _narrow(large, b.above(a.lo, a.lo_strict or self.strict), trail, queue)
+
     def test(self, binding: unification.TYPE_BINDING) -> unification.TYPE_BINDINGS:
         x1, x2 = unification.value(self.x1, binding), unification.value(self.x2, binding)
-        if (language.FREE in [x1, x2]) or not (x1 < x2):
+        if language.FREE not in [x1, x2]:
+            return [binding] if _is_number(x1) and _is_number(x2) and self.holds(x1, x2) else []
+        elif not isinstance(binding, unification.Trail):
             return []
-        else:
-            return [binding]
 
+        _suspend(self, binding, self.x1)
+        _suspend(self, binding, self.x2)
+        return [binding] if _propagate([self], binding) else []
+
+
+class LE(Ordering):
+    def holds(self, x1, x2) -> bool:
+        return x1 <= x2
+
+    def ordered(self):
+        return self.x1, self.x2
+
+
+class GE(Ordering):
+    def holds(self, x1, x2) -> bool:
+        return x1 >= x2
+
+    def ordered(self):
+        return self.x2, self.x1
+
+
+class LT(Ordering):
+    strict = True
+
+    def holds(self, x1, x2) -> bool:
+        return x1 < x2
+
+    def ordered(self):
+        return self.x1, self.x2
+
+
+class GT(Ordering):
+    strict = True
+
+    def holds(self, x1, x2) -> bool:
+        return x1 > x2
+
+    def ordered(self):
+        return self.x2, self.x1
+
+
+class Integer(Constraint):
+    """x is a whole number, so the domain suspended comparisons give it only holds whole numbers"""
+    def __init__(self, x):
+        self.x = x
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.x})"
+
+    def map(self, func):
+        return self.__class__(self.x.map(func) if isinstance(self.x, language.Logical) else func(self.x))
 
-class GT(Comparison):
     def test(self, binding: unification.TYPE_BINDING) -> unification.TYPE_BINDINGS:
-        x1, x2 = unification.value(self.x1, binding), unification.value(self.x2, binding)
-        if (language.FREE in [x1, x2]) or not (x1 > x2):
+        x = unification.value(self.x, binding)
+        if x != language.FREE:
+            return [binding] if x in Interval(integral=True) else []
+        elif not isinstance(binding, unification.Trail):
             return []
-        else:
-            return [binding]
+
+        var = unification.walk(self.x, binding)
+        suspension = binding.attribute(var) or Suspension()
+        domain = replace(suspension.domain, integral=True).rounded()
+        if domain.empty():
+            return []
+        binding.set_attribute(var, replace(suspension, domain=domain))
+        return [binding] if _propagate(suspension.constraints, binding) else []
@@ -1,4 +1,9 @@
-from src import language, unification, table
+import inspect
+import itertools
+import typing
+from collections import defaultdict
+
+from src import language, unification, table, constraints, tracing
 
 
 def take(n, search):
@@ -14,76 +19,552 @@ def take(n, search):
 
 def relevant(query, binding):
     """reduce the binding to only the variables relevant to the query"""
-    new = {}
-    for var in binding:
-        new[var] = binding[var]
-        while new[var] in binding:
-            new[var] = binding[new[var]]
-    return {k: v for k, v in new.items() if k in language.variables_in(query)}
+    return {var: unification.resolve(var, binding) for var in language.variables_in(query) if var in binding}
+
+
+def _settled(binding):
+    """whether no constraints are left suspended on unbound variables, which an answer can't carry
+
+    Such an answer would read as true for every value of the variables, so the engines drop it, as a constraint on
+    a plain dict fails when a side is unbound.
+    """
+    return (not binding.attributes) or\
+        all(not isinstance(unification.walk(var, binding), language.Variable) for var in binding.attributes)
+
+
+once = language.functor("once", 1)
+"""once(goal) proves goal like a body of its own ending in a cut, so at most its first answer is used"""
+
+
+class _Cut:
+    """Shared by the goals in one activation of a clause, records that a cut in its body has been backtracked into"""
+    __slots__ = ("fired",)
+
+    def __init__(self):
+        self.fired = False
+
+
+class _Effect:
+    """Something a search asks of whoever runs it, yielded in place of an answer
+
+    The searches shared by the engines here and in `aio` are generators which yield effects as well as answers, and
+    are run by a driver: `_drive` handles effects on the spot, `aio._drive` awaits them. A search passes on the
+    effects of the searches it runs, with `yield from`, `_first` or `_each`.
+    """
+    __slots__ = ()
+
+
+class _Tick(_Effect):
+    """a resolution step, where an async driver hands control back to the event loop every so often"""
+    __slots__ = ()
 
 
-def _bc_and(tb, query, binding=None, patience=float("inf")):
+_TICK = _Tick()
+
+
+class _Satisfy(_Effect):
+    """asks for the extensions of binding under which a constraint holds, which are sent back into the search"""
+    __slots__ = ("goal", "binding")
+
+    def __init__(self, goal, binding):
+        self.goal = goal
+        self.binding = binding
+
+
+def _drive(steps):
+    """runs a search with effects, yielding its answers and returning what it returns"""
+    sent = None
+    while True:
+        try:
+            item = steps.send(sent)
+        except StopIteration as stop:
+            return stop.value
+        sent = None
+        if isinstance(item, _Satisfy):
+            sent = _test(item.goal, item.binding)
+        elif item is not _TICK:
+            yield item
+
+
+def _complete(steps):
+    """runs a search with effects which gives no answers, returning what it returns"""
+    answers = _drive(steps)
+    while True:
+        try:
+            next(answers)
+        except StopIteration as stop:
+            return stop.value
+
+
+def _first(steps):
+    """runs steps to its first answer, passing its effects on, and returns the answer, or None if it has none"""
+    sent = None
+    while True:
+        try:
+            item = steps.send(sent)
+        except StopIteration:
+            return None
+        if isinstance(item, _Effect):
+            sent = yield item
+        else:
+            steps.close()
+            return item
+
+
+def _each(steps, handle):
+    """runs steps, passing its effects on, and yields handle(answer) for each of its answers, unless that is None"""
+    sent = None
+    while True:
+        try:
+            item = steps.send(sent)
+        except StopIteration:
+            return
+        if isinstance(item, _Effect):
+            sent = yield item
+        else:
+            sent = None
+            result = handle(item)
+            if result is not None:
+                yield result
+
+
+def _bc_and(tb, query, binding=None, patience=float("inf"), offset=None, cut=None):
     if binding is None:
-        binding = {}
+        binding = unification.Trail()
 
-    if binding == language.NO:
-        return []
-    elif query == language.YES:
-        yield dict(binding)
+    if query == language.YES:
+        yield binding
     else:
         query = language.And([query])
-        for satisfies_me in _bc_or(tb, language.substitute(query.first, binding), binding, patience=patience):
-            for satisfies_rest in _bc_and(tb, query.rest, satisfies_me, patience=patience):
+        if query.first == language.CUT:
+            for ans in _bc_and(tb, query.rest, binding, patience=patience, offset=offset, cut=cut):
+                yield ans
+            if cut is not None:  # backtracking past the cut, so nothing before it in the clause is retried
+                cut.fired = True
+            return
+
+        goal = unification.resolve(query.first, binding, offset)
+        for satisfies_me in _bc_goal(tb, goal, binding, patience=patience):
+            for satisfies_rest in _bc_and(tb, query.rest, satisfies_me, patience=patience, offset=offset, cut=cut):
                 yield satisfies_rest
+            if (cut is not None) and cut.fired:
+                return
+
+
+def _bc_goal(tb, goal, binding, patience):
+    if isinstance(goal, constraints.Constraint):
+        return _bc_constraint(goal, binding)
+    elif goal == language.CUT:  # outside a clause there is nothing to cut
+        return iter([binding])
+    elif isinstance(goal, language.Term) and goal.op == "once" and len(goal.args) == 1:
+        return _bc_once(tb, goal.args[0], binding, patience)
+    elif isinstance(goal, language.Not):
+        return iter([binding] if _negation_holds(tb, goal.item, patience) else [])
+    return _bc_or(tb, goal, binding, patience)
+
+
+def _negation_holds(tb, goal, patience):
+    """whether goal has no proof, stopping at the first one, memoized by tables which can (see `negation`)"""
+    return _complete(_negation(tb, goal, patience, _bc_and))
+
+
+def _negation(tb, goal, patience, search):
+    """`_negation_holds` with effects, proving goal with search, which is called like `_bc_and`"""
+    ground = language.is_ground(goal)
+    holds = tb.negation(goal, patience) if ground else None
+    if holds is None:
+        holds = (yield from _first(search(tb, goal, unification.Trail(), patience))) is None
+        if ground:
+            tb.remember_negation(goal, patience, holds)
+    return holds
+
+
+def _bc_once(tb, goal, binding, patience):
+    mark = binding.checkpoint()
+    for ans in _bc_and(tb, goal, binding, patience=patience):
+        yield ans
+        break
+    binding.rollback(mark)
+
+
+def _extend(binding, extension):
+    """binds the variables which extension binds and binding doesn't, returning whether they all unified"""
+    return all(binding.unify(var, val) for var, val in list(extension.items()) if var not in binding)
+
+
+def _test(goal, binding):
+    satisfying = goal.test(binding)
+    if inspect.isawaitable(satisfying) or hasattr(satisfying, "__aiter__"):
+        raise TypeError(f"{goal} is asynchronous, use the functions in src.aio to run it")
+    return satisfying
+
+
+def _bc_constraint(goal, binding):
+    suspended = binding.checkpoint()  # tests may suspend themselves on the trail, see `constraints.Ordering`
+    return _satisfied(binding, suspended, _test(goal, binding))
+
+
+def _satisfied(binding, suspended, extensions):
+    """extends binding with each of extensions in turn, rolling it back to suspended once they run out"""
+    for extension in extensions:
+        mark = binding.checkpoint()
+        if _extend(binding, extension):
+            yield binding
+        binding.rollback(mark)
+    binding.rollback(suspended)
 
 
 def _bc_or(tb, query, binding, patience):
-    for rule in tb.fetch(query, conditional=bool(patience)):
-        rule = language.standardize(rule)
-        for ans in _bc_and(tb, rule.body, unification.unify(rule.head, query, binding), patience=patience-1):
+    if tracing.active is not None:
+        return tracing.active.trace(query, _bc_traced(tb, query, binding, patience, tracing.active))
+    return _bc_clauses(tb, query, binding, patience)
+
+
+def _bc_clauses(tb, query, binding, patience):
+    cut, mark = _Cut(), binding.checkpoint()
+    for body, offset in tb.match(query, binding, conditional=bool(patience)):
+        for ans in _bc_and(tb, body, binding, patience=patience-1, offset=offset, cut=cut):
+            yield ans
+        if cut.fired:  # the rest of the clauses are cut, and so are the bindings the match made
+            binding.rollback(mark)
+            return
+
+
+def _bc_traced(tb, query, binding, patience, tracer):
+    cut, mark = _Cut(), binding.checkpoint()
+    for body, offset in tb.match(query, binding, conditional=bool(patience)):
+        clause = tracer.clause(query, body)
+        for ans in _bc_and(tb, body, binding, patience=patience-1, offset=offset, cut=cut):
+            clause.answers += 1
             yield ans
+        if cut.fired:
+            binding.rollback(mark)
+            return
+
+
+def bc_ask(tb: table.AbstractTable, query: language.Term, patience=float("inf"), first_only: bool = False):
+    """Uses backward chaining to derive query from kb
+
+    The search shares a single `unification.Trail`, so each answer is copied into a plain dict as it is yielded.
+
+    A cut (`language.CUT`, `!`) in a rule's body commits to the choices made since the rule was chosen: when the search
+    backtracks into it, the goals before it in the body aren't retried and the rules after it aren't tried. A goal
+    `once(goal)` gives at most the first answer to goal. With first_only, the search stops after the first answer to
+    the query, dropping every choice point left.
+
+    A negation (`language.Not`, `\\+`) holds if the search finds no proof of its goal, stopping at the first one.
+    Wrapping the table in a `negation.NegationTable` memoizes the outcome for ground goals.
+
+    A proof which leaves constraints suspended on unbound variables (e.g. `q(X) <= LE(X, 5)` asked `q(X)`) isn't an
+    answer, as the constraints can't be returned with it.
+    """
+    answers = (relevant(query, ans) for ans in _bc_goal(tb, query, unification.Trail(), patience=patience)
+               if _settled(ans))
+    return itertools.islice(answers, 1) if first_only else answers
+
+
+def _call_pattern(query):
+    """the predicate of a query and which of its arguments are ground, or None if it isn't a term matched by a table"""
+    if (not isinstance(query, language.Term)) or (query.op == "once" and len(query.args) == 1):
+        return None
+    return query.op, len(query.args), tuple(language.is_ground(arg) for arg in query.args)
+
+
+def _generalize(queries):
+    """a query unifying with every one of queries, keeping the arguments they all share"""
+    first = queries[0]
+    args = tuple(
+        arg if all(query.args[i] == arg for query in queries) else language.Variable("_", language.fresh_id())
+        for i, arg in enumerate(first.args)
+    )
+    return language.Term(first.op, args)
+
+
+def bc_ask_many(tb: table.AbstractTable, queries: typing.Iterable[language.Term],
+                patience=float("inf")) -> typing.Iterator[typing.Tuple[language.Term, dict]]:
+    """Uses backward chaining to answer many queries at once, yielding (query, binding) pairs
+
+    Queries are grouped by predicate and call pattern (which of their arguments are ground). Each group probes the
+    table once, with a query generalizing all of its members, and the clauses found are indexed in a `HashTable` so
+    each query is only matched against the clauses it could unify with. Repeated queries are only answered once.
+    Answers come query by query, in the order the queries were first given.
+
+    Tables with their own `.match()` (e.g. `TabledTable`) are matched query by query instead. Wrapping tb in a
+    `TabledTable` shares the work of subgoals between the queries too, since its answer tables outlive each call.
+    Queries which aren't matched against the table (negations, constraints, `once`) are answered as `bc_ask` would.
+    """
+    queries = list(dict.fromkeys(queries))
+    groups = defaultdict(list)
+    for query in queries:
+        groups[_call_pattern(query)].append(query)
+
+    probed = {}
+    if type(tb).match is table.AbstractTable.match:
+        for pattern, group in groups.items():
+            if (pattern is not None) and len(group) > 1:
+                probed[pattern] = table.HashTable(tb.fetch(_generalize(group), conditional=bool(patience)))
+
+    for query in queries:
+        if _call_pattern(query) is None:
+            for ans in bc_ask(tb, query, patience=patience):
+                yield query, ans
+            continue
+
+        source = probed.get(_call_pattern(query), tb)
+        trail, cut = unification.Trail(), _Cut()
+        for body, offset in source.match(query, trail, conditional=bool(patience)):
+            for ans in _bc_and(tb, body, trail, patience=patience-1, offset=offset, cut=cut):
+                if _settled(ans):
+                    yield query, relevant(query, ans)
+            if cut.fired:
+                break
+
+
+def _fc_join(goals, known, delta, binding):
+    """joins goals against facts, matching the first goal against delta and the rest against known, with effects"""
+    if not goals:
+        yield binding
+        return
+
+    if goals[0] == language.CUT:  # forward chaining makes no choices to commit to
+        yield from _fc_join(goals[1:], known, delta, binding)
+        return
+
+    goal = unification.resolve(goals[0], binding)
+    if isinstance(goal, constraints.Constraint):
+        suspended = binding.checkpoint()
+        extensions = yield _Satisfy(goal, binding)
+        for _ in _satisfied(binding, suspended, extensions):
+            yield from _fc_join(goals[1:], known, None, binding)
+        return
+    elif isinstance(goal, language.Not):
+        if (yield from _fc_absent(goal.item, known, binding)):
+            yield from _fc_join(goals[1:], known, None, binding)
+        return
+
+    source = known if delta is None else delta
+    for fact in source.fetch(goal, conditional=False):
+        yield _TICK
+        mark = binding.checkpoint()
+        if unification.unify_renamed(fact.head, language.fresh_id(fact.n_vars), goal, binding):
+            yield from _fc_join(goals[1:], known, None, binding)
+        binding.rollback(mark)
+
+
+def _fc_absent(goal, known, binding):
+    """whether no facts known prove goal, leaving binding as it was, with effects"""
+    mark = binding.checkpoint()
+    absent = (yield from _first(_fc_join(language.And([goal]).args, known, None, binding))) is None
+    binding.rollback(mark)
+    return absent
+
 
+def _fc_seed(tb):
+    """the rules of tb, plus a table of its facts, their variants, and a list of them to start the first round with"""
+    rules = [rule for rule in tb.rules() if rule.body != language.YES]
+    seen = set()
+    delta = []
+    for fact in tb.facts():
+        if language.variant(fact) not in seen:
+            seen.add(language.variant(fact))
+            delta.append(fact)
+    known = table.HashTable()
+    known.tell_many(delta)
+    return rules, known, seen, delta
 
-def bc_ask(tb: table.AbstractTable, query: language.Term, patience=float("inf")):
-    """Uses backward chaining to derive query from kb"""
-    return (relevant(query, ans) for ans in _bc_or(tb, query, {}, patience=patience))
+
+def _fc_orderings(rule):
+    """the orders to join a rule's body in, one starting with each of its terms, which is matched against the delta
+
+    Negations go last, so they are checked once the rest of the body has bound their variables.
+    """
+    body = language.And([rule.body]).args
+    negations = tuple(goal for goal in body if isinstance(goal, language.Not))
+    body = tuple(goal for goal in body if not isinstance(goal, language.Not))
+    for i in range(len(body)):
+        if isinstance(body[i], language.Term):
+            yield (body[i],) + body[:i] + body[i + 1:] + negations
 
 
 def fc_ask(tb: table.AbstractTable, query: language.Term) -> unification.TYPE_BINDINGS:
-    """Uses forward chaining to derive query from kb"""
+    """Uses forward chaining to derive query from kb
+
+    Evaluation is semi-naive: each round only looks for derivations that use at least one fact derived in the round
+    before, by matching one conjunct of each rule body against those facts and the rest against everything known.
+    Derived facts are told to the kb. Negations are checked against the facts known when the rule fires, so they
+    are only sound if the facts they negate aren't derived later.
+    """
+    return _drive(_forward(tb, query))
+
 
+def _forward(tb, query):
+    """`fc_ask` as a search with effects"""
     for freebie in bc_ask(tb, query, patience=0):
         yield freebie
 
-    new = True
-    while new:
-        new = set()
-        for rule in tb.rules():
-            for binding in _bc_and(tb, rule.body, patience=0):
-                q = language.substitute(rule.head, binding)
-                if not any(unification.unifiable(q, fact) for fact in tb.facts()):
-                    new.add(q)
+    rules, known, seen, delta = _fc_seed(tb)
+    while delta:
+        delta_table, delta = table.HashTable(delta), []
+        for rule in rules:
+            for goals in _fc_orderings(rule):
+                yield from _each(_fc_join(goals, known, delta_table, unification.Trail()),
+                                 lambda binding: _fc_derive(rule, binding, seen, delta))
 
-        for term in new:
+        known.tell_many(delta)
+        tb.tell_many(language.Rule(term, language.YES) for term in delta)
+        for term in delta:
             s = unification.unify(term, query)
             if s != language.NO:
                 yield dict(s)
-            tb.tell(language.Rule(term, language.YES))
+
+
+def _fc_derive(rule, binding, seen, derived):
+    """adds what rule concludes under binding to derived, unless it is a variant of something seen before"""
+    if not _settled(binding):
+        return
+    q = unification.resolve(rule.head, binding)
+    if language.variant(q) not in seen:
+        seen.add(language.variant(q))
+        derived.append(q)
+
+
+class _Deepening:
+    """The state of one pass of `id_ask` over a branch of the search"""
+    __slots__ = ("instance", "frontier", "cut_to")
+
+    def __init__(self, instance, frontier):
+        self.instance = instance  # the instance of the query the branch proves
+        self.frontier = frontier  # branches cut off by patience, as (goals, instance) pairs for the next level
+        self.cut_to = None  # the choice point a cut is backtracking to, if any
+
+
+def _deepen(tb, goals, binding, state, depth=0, rules_only=False):
+    """proves goals, a tuple of (goal, offset, patience, barrier) entries, recording the branches cut off by patience
+
+    A search with effects, see `_Effect`.
+    The search keeps everything left to prove in goals, so a branch can be cut off at any goal and picked up again.
+    A goal out of patience is only matched against facts, and if rules match it too, it is recorded in
+    `state.frontier` with the goals after it. A cut's barrier is the depth of the choice point it cuts back to and
+    the length of the frontier when the rule was chosen: branches cut off since then were alternatives to the cut.
+    """
+    if not goals:
+        yield binding
+        return
+
+    (goal, offset, patience, barrier), rest = goals[0], goals[1:]
+    if goal == language.CUT:
+        to, mark = barrier
+        del state.frontier[mark:]
+        yield from _deepen(tb, rest, binding, state, depth)
+        state.cut_to = to if state.cut_to is None else min(state.cut_to, to)
+        return
+
+    goal = unification.resolve(goal, binding, offset)
+    if isinstance(goal, constraints.Constraint):
+        suspended = binding.checkpoint()
+        extensions = yield _Satisfy(goal, binding)
+        alternatives = ((language.YES, None) for _ in _satisfied(binding, suspended, extensions))
+    elif isinstance(goal, language.Term) and goal.op == "once" and len(goal.args) == 1:
+        alternatives = iter([(language.And([goal.args[0], language.CUT]), None)])
+    elif isinstance(goal, language.Not):
+        holds = yield from _deepen_negation(tb, goal.item, patience)
+        if holds is None:
+            _cut_off(state, goal, patience, rest, binding)
+        alternatives = iter([(language.YES, None)] if holds else [])
+    else:
+        alternatives = tb.match(goal, binding)
+        if rules_only:
+            alternatives = ((body, body_offset) for body, body_offset in alternatives if body != language.YES)
+
+    mark, cut_off = binding.checkpoint(), False
+    for body, body_offset in alternatives:
+        yield _TICK
+        if (body != language.YES) and not patience:
+            if not cut_off:
+                cut_off = True
+                _cut_off(state, goal, patience, rest, binding)
+            continue
+
+        barrier = (depth, len(state.frontier))
+        body_goals = tuple((g, body_offset, patience - 1, barrier) for g in language.And([body]).args)
+        yield from _deepen(tb, body_goals + rest, binding, state, depth + 1)
+        if (state.cut_to is not None) and state.cut_to <= depth:
+            if state.cut_to == depth:
+                state.cut_to = None
+            binding.rollback(mark)
+            return
+
+
+def _cut_off(state, goal, patience, rest, binding):
+    """records the branch at goal, with everything left to prove after it, for the next level"""
+    state.frontier.append((
+        ((goal, patience),) + tuple((g if g == language.CUT else unification.resolve(g, binding, o), p)
+                                    for g, o, p, _ in rest),
+        unification.resolve(state.instance, binding),
+    ))
+
+
+def _deepen_negation(tb, goal, patience):
+    """whether goal has no proof, or None if that depends on a branch cut off by patience, with effects
+
+    A conclusive answer holds however deep the search goes, so it is memoized as if patience were infinite.
+    """
+    ground = language.is_ground(goal)
+    holds = tb.negation(goal, float("inf")) if ground else None
+    if holds is None:
+        inner = _Deepening(None, [])
+        goals = tuple((g, None, patience, (0, 0)) for g in language.And([goal]).args)
+        if (yield from _first(_deepen(tb, goals, unification.Trail(), inner))) is not None:
+            holds = False
+        elif not inner.frontier:
+            holds = True
+        if ground and (holds is not None):
+            tb.remember_negation(goal, float("inf"), holds)
+    return holds
 
 
 def id_ask(tb: table.AbstractTable, query: language.Term, patience=float("inf")) -> unification.TYPE_BINDINGS:
-    """Uses iterative deepening search to derive query, allowing it to solve more problems than backward chaining"""
+    """Uses iterative deepening search to derive query, allowing it to solve more problems than backward chaining
 
-    level = 0
-    drop_first = 0
+    Each level searches one rule deeper than the one before, but only where the level before was cut off: the
+    branches which ran out of patience are kept, with everything left to prove in them, and the next level picks up
+    from each of them instead of searching the shallower levels again. The search stops when no branch was cut off,
+    or after patience + 1 levels. Answers are yielded as the levels find them, skipping any equal to an answer
+    already given (up to the names of their variables).
 
-    while level <= patience:
+    A negation only holds once its goal has no proof without cutting anything off, otherwise it is cut off itself.
+    Cuts prune the branches found inside one level. Ones found at the next level from a branch cut off before the
+    cut was reached are kept, so a cut there may give more answers than it would in `bc_ask`.
+    """
+    return _drive(_levels(tb, query, patience))
+
+
+def _levels(tb, query, patience):
+    """`id_ask` as a search with effects"""
+    seen = set()
+    frontier = [(((query, 0),), query)]
+    rules_only = False
+    level = 0
+    while frontier and level <= patience:
         level += 1
-        n_finds = 0
+        branches, frontier = frontier, []
+        for goals, instance in branches:
+            state = _Deepening(instance, frontier)
+            goals = tuple((goal, None, goal_patience + 1, (0, len(frontier))) for goal, goal_patience in goals)
+            yield from _each(_deepen(tb, goals, unification.Trail(), state, rules_only=rules_only),
+                             lambda binding: _id_answer(query, instance, binding, seen))
+        rules_only = True
 
-        for binding in bc_ask(tb, query, patience=level):
-            n_finds += 1
-            if n_finds > drop_first:  # so search results from each level don't get repeated every subsequent level
-                yield binding
 
-        drop_first = n_finds
+def _id_answer(query, instance, binding, seen):
+    """the answer to query a branch proving instance gives, or None if it gave an equal one before"""
+    if not _settled(binding):
+        return None
+    answer = unification.resolve(instance, binding)
+    if language.variant(answer) in seen:
+        return None
+    seen.add(language.variant(answer))
+    if not language.is_ground(answer):
+        answer = language.standardize(answer)
+    # the answer's variables are bound to the query's, as a clause head's are in bc_ask, so free ones are left out
+    return relevant(query, unification.unify(answer, query))
@@ -1,43 +1,112 @@
 import typing
 import abc
-from dataclasses import dataclass, replace
+import weakref
+from dataclasses import dataclass, field
 
 _vid = 1000
 """used in variable renaming"""
 
 
+def fresh_id(n: int = 1) -> int:
+    """Returns an id which has not been used for renaming variables before, reserving the n ids starting at it"""
+    global _vid
+    _vid += n
+    return _vid - n
+
+
 def variables_in(x: "Logical"):
     vs = set()
 
     def _report_variables_in(thing):
         if isinstance(thing, Variable):
             vs.add(thing)
+        elif isinstance(thing, tuple):
+            for item in thing:
+                item.map(_report_variables_in) if isinstance(item, Logical) else _report_variables_in(item)
         return thing
 
     if isinstance(x, Logical):
         x.map(_report_variables_in)
+    else:
+        _report_variables_in(x)
 
     return vs
 
 
+def is_ground(x) -> bool:
+    """Whether x contains no variables, looking inside nested terms and lists"""
+    if isinstance(x, Variable):
+        return False
+    elif isinstance(x, Term):
+        return x._ground
+    elif isinstance(x, tuple):
+        return all(is_ground(item) for item in x)
+    elif isinstance(x, Logical):
+        return not variables_in(x)
+    return True
+
+
+def variant(x):
+    """Renames the variables in x in order of appearance, so goals which are variants of each other become equal"""
+    names = {}
+
+    def _rename(thing):
+        if isinstance(thing, Variable):
+            if thing not in names:
+                names[thing] = Variable("_", len(names))
+            return names[thing]
+        elif isinstance(thing, Term):
+            return Term(thing.op, tuple(_rename(arg) for arg in thing.args))
+        elif isinstance(thing, tuple):
+            return tuple(_rename(item) for item in thing)
+        return thing
+
+    return _rename(x)
+
+
 def standardize(x: typing.Union["Rule", "Logical"], reset: bool = False):
     """Renames all the variables in a term"""
-    global _vid
-
-    if reset:
-        _id = None
-    else:
-        _id = _vid
-        _vid += 1
+    _id = None if reset else fresh_id()
 
     def _do_standardize(_x):
-        if isinstance(_x, Variable):
-            return replace(_x, _id=_id)
+        if isinstance(_x, tuple):
+            return tuple(item.map(_do_standardize) if isinstance(item, Logical) else _do_standardize(item)
+                         for item in _x)
+        elif isinstance(_x, Variable):
+            return _x.__class__(_x.name, _id)
         return _x
 
     return x.map(_do_standardize)
 
 
+def number_variables(rule: "Rule") -> "Rule":
+    """Renames the variables in a rule to ids 0..n-1 in order of appearance, so it can be renamed with `rename`"""
+    ids = {}
+
+    def _do_number(_x):
+        if isinstance(_x, tuple):
+            return tuple(item.map(_do_number) if isinstance(item, Logical) else _do_number(item) for item in _x)
+        elif isinstance(_x, Variable):
+            if _x not in ids:
+                ids[_x] = _x.__class__(_x.name, len(ids))
+            return ids[_x]
+        return _x
+
+    numbered = rule.map(_do_number)
+    return Rule(numbered.head, numbered.body, n_vars=len(ids))
+
+
+def rename(x: typing.Union["Rule", "Logical"], offset: int):
+    """Renames the variables in something taken from a numbered rule by adding offset to their ids"""
+    def _do_rename(_x):
+        if isinstance(_x, tuple):
+            return tuple(item.map(_do_rename) if isinstance(item, Logical) else _do_rename(item) for item in _x)
+        elif isinstance(_x, Variable):
+            return _x.__class__(_x.name, _x._id + offset)
+        return _x
+    return x.map(_do_rename) if isinstance(x, (Logical, Rule)) else _do_rename(x)
+
+
 def substitute(x: typing.Union["Rule", "Logical"], binding):
     """Substitutes provided bindings for variables in term"""
     def _do_substitute(_x):
@@ -48,6 +117,7 @@ def substitute(x: typing.Union["Rule", "Logical"], binding):
 
 
 class Logical(abc.ABC):
+    __slots__ = ()
 
     def __and__(self, other):
         return And((self, other))
@@ -84,7 +154,10 @@ class Join(Logical, abc.ABC):
         return tuple(new)
 
     def map(self, func):
-        return self.__class__(arg.map(func) if isinstance(arg, Logical) else func(arg) for arg in self.args)
+        args = tuple(arg.map(func) if isinstance(arg, Logical) else func(arg) for arg in self.args)
+        if all(new is old for new, old in zip(args, self.args)):
+            return self
+        return self.__class__(args)
 
     @property
     def first(self) -> typing.Any:
@@ -143,7 +216,7 @@ class Keyword(Logical):
         return self.name
 
     def map(self, func):
-        return func(self)
+        return self  # no children
 
 
 CUT = Keyword("CUT")
@@ -158,10 +231,21 @@ class Not(Logical):
         return "~" + self.item.__repr__()
 
     def map(self, func):
-        return Not(self.item.map(func))
+        item = self.item.map(func)
+        return self if item is self.item else Not(item)
+
+
+def _exact(x):
+    """a key telling x apart from equal values of other types, and interned logical objects apart by identity"""
+    if type(x) is str:  # the only unwrapped keys, so they can't equal any of the others
+        return x
+    elif isinstance(x, Logical):
+        return id(x),
+    elif isinstance(x, tuple):
+        return tuple, tuple(map(_exact, x))
+    return type(x), x
 
 
-@dataclass(frozen=True)
 class Term(Logical):
     """The datatype for representing logical claims
 
@@ -169,12 +253,53 @@ class Term(Logical):
     representing logical sentences. Example: you could represent the prolog
     sentence `sibling(leo, milo)` with `Term("sibling", ["leo", "milo"])`
 
+    Terms are hash-consed: making a term identical to one which already exists
+    returns the existing object. So the hash is only computed once, and terms with
+    different hashes are unequal without comparing their arguments.
+
     Attributes:
         op - the functor, a string
         args - tuple of arguments (terms or strings)
     """
-    op: str
-    args: tuple = ()
+    __slots__ = ("op", "args", "_hash", "_ground", "__weakref__")
+    _interned = weakref.WeakValueDictionary()
+
+    def __new__(cls, op: str, args: tuple = ()):
+        args = tuple(args)
+        try:
+            key, hashed = (cls, op) + tuple(map(_exact, args)), hash((op, args))
+            self = cls._interned.get(key)
+        except TypeError:  # unhashable arguments, can't be interned
+            key, hashed, self = None, None, None
+
+        if self is None:
+            self = object.__new__(cls)
+            object.__setattr__(self, "op", op)
+            object.__setattr__(self, "args", args)
+            object.__setattr__(self, "_hash", hashed)
+            object.__setattr__(self, "_ground", all(is_ground(arg) for arg in args))
+            if key is not None:
+                cls._interned[key] = self
+        return self
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    def __reduce__(self):
+        return self.__class__, (self.op, self.args)
+
+    def __hash__(self):
+        return hash((self.op, self.args)) if self._hash is None else self._hash
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        elif not isinstance(other, Term):
+            return NotImplemented
+        elif (self._hash is not None) and (other._hash is not None) and (self._hash != other._hash):
+            return False
+        # equal values of different types, like 1 and 1.0, are interned apart but still equal
+        return (self.op == other.op) and (self.args == other.args)
 
     def __repr__(self):
         if self.args:
@@ -186,7 +311,10 @@ class Term(Logical):
         return Rule(self, other)
 
     def map(self, func):
-        return Term(self.op, tuple(func(arg) for arg in self.args))
+        args = tuple(arg.map(func) if isinstance(arg, Logical) else func(arg) for arg in self.args)
+        if all(new is old for new, old in zip(args, self.args)):
+            return self
+        return Term(self.op, args)
 
 
 def functor(name: str, arity: typing.Optional[int] = None) -> typing.Callable:
@@ -208,16 +336,43 @@ def functor(name: str, arity: typing.Optional[int] = None) -> typing.Callable:
     return make_term
 
 
-@dataclass(frozen=True)
 class Variable(Logical):
-    name: str
-    _id: typing.Optional[int] = None
+    """A logical variable, hash-consed like `Term` so equal variables are the same object"""
+    __slots__ = ("name", "_id", "_hash", "__weakref__")
+    _interned = weakref.WeakValueDictionary()
+
+    def __new__(cls, name: str, _id: typing.Optional[int] = None):
+        key = (cls, name, _id)
+        self = cls._interned.get(key)
+        if self is None:
+            self = object.__new__(cls)
+            object.__setattr__(self, "name", name)
+            object.__setattr__(self, "_id", _id)
+            object.__setattr__(self, "_hash", hash((name, _id)))
+            cls._interned[key] = self
+        return self
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    def __reduce__(self):
+        return self.__class__, (self.name, self._id)
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        elif not isinstance(other, Variable):
+            return NotImplemented
+        return False
 
     def __pos__(self) -> "Tail":
         return Tail(self.name, self._id)
 
     def __repr__(self):
-        if self._id:
+        if self._id is not None:
             return f"{self.name}_{self._id}"
         else:
             return self.name
@@ -244,14 +399,23 @@ class Tail(Variable):
     Best explained with an example: the prolog `X = [H | T]` and the python `unify(X, [H, +T])`
     represent the same thing.
     """
+    __slots__ = ()
+
     def __repr__(self):
         return "+" + self.name
 
 
 @dataclass(frozen=True)
 class Rule:
+    """A head which holds if the body does
+
+    Tables store rules with their variables numbered 0..n-1 (see `number_variables`), with n kept in `n_vars`. The
+    inference engine then renames a rule apart by adding a fresh offset to those ids as it goes, rather than copying
+    the rule before using it.
+    """
     head: Term
     body: Logical = YES
+    n_vars: typing.Optional[int] = field(default=None, compare=False, repr=False)
 
     @property
     def op(self):
@@ -262,7 +426,10 @@ class Rule:
         return self.head.args
 
     def map(self, func):
-        return Rule(self.head.map(func), self.body.map(func))
+        head, body = self.head.map(func), self.body.map(func)
+        if (head is self.head) and (body is self.body):
+            return self
+        return Rule(head, body)
 
     def __repr__(self) -> str:
         return f"{self.head} <= {self.body}"
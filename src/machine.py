@@ -0,0 +1,77 @@
+import itertools
+import typing
+
+from src import language, unification, table, constraints, inference
+
+TYPE_GOALS = typing.Optional[typing.Tuple[typing.Tuple[typing.Any, typing.Optional[int], float, int], "TYPE_GOALS"]]
+"""goals left to prove, as a linked list of ((goal, offset, patience, barrier), rest) cells, so choice points can share
+tails. The barrier is how many choice points there were before the clause the goal came from was chosen, so a cut
+drops every choice point from there on."""
+
+
+def _push(body: language.Logical, offset: typing.Optional[int], patience: float, barrier: int,
+          goals: TYPE_GOALS) -> TYPE_GOALS:
+    """puts the conjuncts of body on top of goals"""
+    for goal in reversed(language.And([body]).args):
+        goals = ((goal, offset, patience, barrier), goals)
+    return goals
+
+
+def _search(tb: table.AbstractTable, body: language.Logical, binding: unification.Trail, patience: float):
+    return _run(tb, _push(body, None, patience, 0, None), binding)
+
+
+def _run(tb: table.AbstractTable, goals: TYPE_GOALS, binding: unification.Trail) -> typing.Iterator:
+    """proves goals, yielding the binding every time they all hold, with effects (see `inference._Effect`)"""
+    choices = []  # (alternatives for a goal, the goals after it, its patience)
+    while True:
+        if goals is None:
+            yield binding
+        else:
+            (goal, offset, patience, barrier), goals = goals
+            if goal == language.CUT:
+                del choices[barrier:]
+                continue
+            goal = unification.resolve(goal, binding, offset)
+            if isinstance(goal, constraints.Constraint):
+                suspended = binding.checkpoint()
+                extensions = yield inference._Satisfy(goal, binding)
+                alternatives = ((language.YES, None) for _ in inference._satisfied(binding, suspended, extensions))
+            elif isinstance(goal, language.Term) and goal.op == "once" and len(goal.args) == 1:
+                alternatives = iter([(language.And([goal.args[0], language.CUT]), None)])
+            elif isinstance(goal, language.Not):
+                holds = yield from inference._negation(tb, goal.item, patience, _search)
+                alternatives = iter([(language.YES, None)] if holds else [])
+            else:
+                alternatives = tb.match(goal, binding, conditional=bool(patience))
+            choices.append((alternatives, goals, patience))
+
+        # backtrack to the newest goal with an alternative left; resuming a match rolls back the bindings made since
+        while choices:
+            alternatives, rest, patience = choices[-1]
+            alternative = next(alternatives, None)
+            if alternative is not None:
+                yield inference._TICK
+                body, offset = alternative
+                goals = _push(body, offset, patience - 1, len(choices) - 1, rest)
+                break
+            choices.pop()
+        else:
+            return
+
+
+def bc_ask_iterative(tb: table.AbstractTable, query: language.Term,
+                     patience=float("inf"), first_only: bool = False) -> unification.TYPE_BINDINGS:
+    """Uses backward chaining to derive query from kb, with an explicit goal stack instead of recursion
+
+    Gives the same answers in the same order as `inference.bc_ask`. Instead of a generator per goal, the goals left to
+    prove are kept in a linked list, and a stack of choice points holds the alternatives left for each goal along
+    with the goals which came after it. Backtracking resumes the newest choice point. So a proof thousands of levels
+    deep uses a constant amount of the Python stack, and each answer is handed straight to the caller rather than
+    passing up through a generator per level. Choice points are kept until their alternatives run out or are cut, so
+    memory still grows with the depth of the proof. Cuts, `once` and first_only work as they do for `inference.bc_ask`.
+    """
+    trail = unification.Trail()
+    steps = _run(tb, ((query, None, patience, 0), None), trail)
+    answers = (inference.relevant(query, ans) for ans in inference._drive(steps) if inference._settled(ans))
+    return itertools.islice(answers, 1) if first_only else answers
@@ -0,0 +1,96 @@
+import typing
+from collections import defaultdict
+
+from src import language, unification, table
+
+TYPE_PREDICATE = typing.Tuple[str, int]
+
+
+def predicates_in(x: language.Logical) -> typing.Iterator[TYPE_PREDICATE]:
+    """the predicates called by the goals in x, looking inside conjunctions, disjunctions, negations and once/1"""
+    if isinstance(x, language.Term):
+        yield x.op, len(x.args)
+        if x.op == "once" and len(x.args) == 1:
+            for key in predicates_in(x.args[0]):
+                yield key
+    elif isinstance(x, language.Join):
+        for arg in x.args:
+            for key in predicates_in(arg):
+                yield key
+    elif isinstance(x, language.Not):
+        for key in predicates_in(x.item):
+            yield key
+
+
+class NegationTable(table.AbstractTable):
+    """Wraps a table, memoizing whether negated ground subgoals hold
+
+    Backward chaining proves `Not(goal)` by looking for a single proof of goal, and holds if there is none (negation
+    as failure). Through this wrapper, the outcome for each ground goal (and patience) is kept, so a program which
+    keeps asking e.g. `\\+ wizard(harry)` only searches once. Non-ground negations aren't memoized.
+
+    The wrapper keeps a graph of which predicates call which through the bodies of rules. An outcome is thrown away
+    when the table is told a rule for a predicate the goal depends on: one it calls, directly or through other rules.
+    Only the table the engine is given is asked for memoized outcomes, so wrap other tables in this one, not the
+    other way around.
+
+    Arguments:
+        table: a table to wrap
+    """
+    def __init__(self, table: table.AbstractTable):
+        self.table: table.AbstractTable = table
+        self.callers: typing.Dict[TYPE_PREDICATE, typing.Set[TYPE_PREDICATE]] = defaultdict(set)
+        self.negations: typing.Dict[typing.Tuple[language.Logical, float], bool] = {}
+        self.memoized: typing.Dict[TYPE_PREDICATE, typing.Set[typing.Tuple[language.Logical, float]]] = \
+            defaultdict(set)
+
+        for rule in table.rules():
+            self._index(rule)
+
+    def _index(self, rule: language.Rule) -> TYPE_PREDICATE:
+        key = (rule.op, len(rule.args))
+        for callee in predicates_in(rule.body):
+            self.callers[callee].add(key)
+        return key
+
+    def _invalidate(self, changed: typing.Iterable[TYPE_PREDICATE]) -> None:
+        """forgets the negations depending on the changed predicates"""
+        affected, stack = set(), list(changed)
+        while stack:
+            key = stack.pop()
+            if key not in affected:
+                affected.add(key)
+                stack.extend(self.callers.get(key, ()))
+
+        for key in affected:
+            for memo in self.memoized.pop(key, ()):
+                self.negations.pop(memo, None)
+
+    def negation(self, goal: language.Logical, patience: float) -> typing.Optional[bool]:
+        return self.negations.get((goal, patience))
+
+    def remember_negation(self, goal: language.Logical, patience: float, holds: bool) -> None:
+        self.negations[goal, patience] = holds
+        for key in predicates_in(goal):
+            self.memoized[key].add((goal, patience))
+
+    def match(self, query: language.Term, binding: unification.Trail,
+              conditional: bool = True) -> typing.Iterator[typing.Tuple[language.Logical, typing.Optional[int]]]:
+        return self.table.match(query, binding, conditional=conditional)
+
+    def tell(self, rule: typing.Union[language.Term, language.Rule]) -> None:
+        if isinstance(rule, language.Term):
+            rule = language.Rule(rule, language.YES)
+        self.table.tell(rule)
+        self._invalidate([self._index(rule)])
+
+    def tell_many(self, rules: typing.Iterable[typing.Union[language.Term, language.Rule]]) -> None:
+        rules = [language.Rule(rule, language.YES) if isinstance(rule, language.Term) else rule for rule in rules]
+        self.table.tell_many(rules)
+        self._invalidate({self._index(rule) for rule in rules})
+
+    def fetch(self, query: language.Term, conditional: bool = True) -> typing.Iterator[language.Rule]:
+        return self.table.fetch(query, conditional=conditional)
+
+    def rules(self) -> typing.Iterable[language.Rule]:
+        return self.table.rules()
@@ -0,0 +1,140 @@
+import concurrent.futures
+import multiprocessing
+import multiprocessing.synchronize
+import os
+import typing
+
+from src import language, unification, table, inference, machine
+
+TYPE_GOALS = typing.Tuple[typing.Tuple[language.Logical, float], ...]
+"""goals left to prove, each with the patience it has left"""
+
+_table: typing.Optional[table.AbstractTable] = None
+"""the table each worker process searches, set once when the worker starts"""
+
+_answers: typing.Optional[multiprocessing.Queue] = None
+"""where workers put the instances of the query they prove, and None when they finish an alternative"""
+
+_stop: typing.Optional[multiprocessing.synchronize.Event] = None
+"""set once the consumer is done, so running workers give up"""
+
+_CHECK_EVERY = 100
+"""how many resolution steps a worker takes between looking at `_stop`"""
+
+
+def _init_worker(tb: table.AbstractTable, answers: multiprocessing.Queue,
+                 stop: multiprocessing.synchronize.Event) -> None:
+    global _table, _answers, _stop
+    _table, _answers, _stop = tb, answers, stop
+    answers.cancel_join_thread()  # answers nobody will read mustn't keep a stopped worker from exiting
+
+
+def _solve(goals: TYPE_GOALS, instance: language.Term, limit: typing.Optional[int]) -> None:
+    """runs in a worker, putting up to limit instances of the query which follow from the goals on `_answers`"""
+    stack = None
+    for goal, patience in reversed(goals):
+        if goal != language.CUT:  # cuts in rules expanded before the split are ignored
+            stack = ((goal, None, patience, 0), stack)
+
+    steps, n_answers, n_steps, sent = machine._run(_table, stack, unification.Trail()), 0, 0, None
+    try:
+        while n_answers != limit:
+            item = steps.send(sent)
+            sent = None
+            if item is inference._TICK:
+                n_steps += 1
+                if (n_steps % _CHECK_EVERY == 0) and _stop.is_set():
+                    return
+            elif isinstance(item, inference._Satisfy):
+                sent = inference._test(item.goal, item.binding)
+            elif inference._settled(item):
+                _answers.put(unification.resolve(instance, item))
+                n_answers += 1
+    except StopIteration:
+        pass
+    finally:
+        _answers.put(None)
+
+
+def _split(tb: table.AbstractTable, query: language.Term, patience: float, n: int, depth: int):
+    """expands the search tree breadth first, until there are n alternatives or it is depth levels deep
+
+    Returns the instances of the query proven along the way, and the alternatives left as (goals, instance) pairs.
+    Everything in an alternative is fully substituted, so it can be searched without the binding that led to it.
+    """
+    proven, frontier = [], [(((query, patience),), query)]
+    for _ in range(depth):
+        expanded = []
+        for goals, instance in frontier:
+            (goal, goal_patience), rest = goals[0], goals[1:]
+            if (not isinstance(goal, language.Term)) or goal.op == "once":  # left for the worker to check
+                expanded.append((goals, instance))
+                continue
+            trail = unification.Trail()
+            for body, offset in tb.match(goal, trail, conditional=bool(goal_patience)):
+                new_goals = tuple((unification.resolve(g, trail, offset), goal_patience - 1)
+                                  for g in language.And([body]).args)
+                new_goals += tuple((unification.resolve(g, trail), p) for g, p in rest)
+                if new_goals:
+                    expanded.append((new_goals, unification.resolve(instance, trail)))
+                else:
+                    proven.append(unification.resolve(instance, trail))
+
+        frontier = expanded
+        if len(frontier) >= n:
+            break
+    return proven, frontier
+
+
+def parallel_bc_ask(tb: table.AbstractTable, query: language.Term, limit: typing.Optional[int] = None,
+                    max_workers: typing.Optional[int] = None, patience=float("inf"),
+                    depth: int = 3) -> unification.TYPE_BINDINGS:
+    """Uses backward chaining to derive query from kb, searching alternatives in parallel in a process pool
+
+    The search tree is expanded breadth first in this process, up to depth levels or until there are a few
+    alternatives for every worker. Each alternative is then searched by ordinary backward chaining in a worker process.
+    The table is pickled once per worker. Answers are yielded as the workers find them, so they don't come in the
+    same order as `bc_ask`'s. Cuts in the rules expanded before the split are ignored, since the alternatives they
+    would prune may already be running in other processes. Cuts met inside a worker work as usual.
+
+    Workers stream answers back as they find them. Once limit answers have been yielded (or the generator is closed)
+    alternatives which haven't started are cancelled, and running workers stop within a few resolution steps.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    proven, alternatives = _split(tb, query, patience, 4 * max_workers, depth)
+
+    def answer(instance):
+        if not language.is_ground(instance):
+            instance = language.standardize(instance)
+        return inference.relevant(query, unification.unify(instance, query))
+
+    n_answers = 0
+    for instance in proven:
+        if n_answers == limit:
+            return
+        yield answer(instance)
+        n_answers += 1
+
+    if (not alternatives) or (n_answers == limit):
+        return
+
+    answers, stop = multiprocessing.Queue(), multiprocessing.Event()
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers, initializer=_init_worker,
+                                                      initargs=(tb, answers, stop))
+    futures = [executor.submit(_solve, goals, instance, limit) for goals, instance in alternatives]
+    try:
+        running = len(futures)
+        while running:
+            instance = answers.get()
+            if instance is None:
+                running -= 1
+                continue
+            yield answer(instance)
+            n_answers += 1
+            if n_answers == limit:
+                return
+        for future in futures:
+            future.result()  # raises what went wrong in a worker
+    finally:
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -1,5 +1,8 @@
 from pathlib import Path
-from lark import Lark, Transformer
+from lark import Lark, Transformer, Tree
+import functools
+import os
+import re
 import typing
 
 from src import language
@@ -7,10 +10,6 @@ from src import language
 # get the right file regardless of working directory
 filename = Path(__file__).parent / "prolog.lark"
 
-# the file prolog.lark has ebnf for prolog
-with open(filename) as f:
-    parser = Lark(f)
-
 
 class PrologTransformer(Transformer):
 
@@ -71,6 +70,25 @@ class PrologTransformer(Transformer):
         return str(tree[0])[1:-1]  # removes quotes
 
 
+@functools.lru_cache(maxsize=None)
+def get_parser() -> Lark:
+    """Builds the parser for prolog.lark the first time it is needed
+
+    The grammar is LALR(1) and the transformer runs as each rule is reduced, so no parse tree is kept around. Lark
+    caches the parse tables in the temp directory, keyed by a hash of the grammar, so other processes skip building
+    them.
+    """
+    with open(filename) as f:
+        return Lark(f, parser="lalr", transformer=PrologTransformer(), cache=True)
+
+
+def __getattr__(name):
+    # `parser` used to be built when this module was imported
+    if name == "parser":
+        return get_parser()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 def prolog(pg: typing.Union[str, typing.IO]):
     """Parse a prolog program"""
     try:
@@ -78,5 +96,98 @@ def prolog(pg: typing.Union[str, typing.IO]):
     except AttributeError:
         pass
 
-    parse_tree = parser.parse(pg)
-    return PrologTransformer().transform(parse_tree)
+    return get_parser().parse(pg)
+
+
+# a clause is everything up to a "." followed by whitespace, skipping over quoted strings and atoms
+_CLAUSE = re.compile(r"""\s*((?:"(?:[^"\\]|\\.)*"|'[^']*'|[^"'.]|\.(?!\s))+)\.(?=\s)""", re.S)
+
+# ground facts whose arguments are all atoms, which can be built without the parser
+_ATOM = r"[a-z]\w+|'[a-z][\w ]*'"
+_FACT = re.compile(rf"\s*({_ATOM})\s*(?:\(\s*((?:{_ATOM})(?:\s*,\s*(?:{_ATOM}))*)\s*\))?\s*")
+_KEYWORDS = {"true", "false", "fail", "not", "dynamic"}
+
+
+def _clauses(stream: typing.IO, chunk_size: int) -> typing.Iterator[str]:
+    """splits prolog text into clauses (without their final "."), reading it a chunk at a time"""
+    buffer = ""
+    while True:
+        chunk = stream.read(chunk_size)
+        buffer += chunk if chunk else "\n"  # so the last "." is followed by whitespace
+
+        pos = 0
+        match = _CLAUSE.match(buffer, pos)
+        while match:
+            yield match.group(1)
+            pos = match.end()
+            match = _CLAUSE.match(buffer, pos)
+        buffer = buffer[pos:]
+
+        if not chunk:
+            if buffer.strip():
+                raise ValueError(f"clause is missing its final \".\": {buffer.strip()[:100]}")
+            return
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def _atom(token: str) -> language.Term:
+    return language.Term(token[1:-1] if token.startswith("'") else token)
+
+
+def _clause(text: str):
+    """parses a single clause, building simple ground facts directly"""
+    fact = _FACT.fullmatch(text)
+    if fact and (fact.group(1) not in _KEYWORDS):
+        args = re.findall(_ATOM, fact.group(2)) if fact.group(2) else ()
+        return language.Term(_atom(fact.group(1)).op, tuple(_atom(arg) for arg in args))
+
+    parsed = get_parser().parse(text + ".")
+    return parsed[0] if parsed else None
+
+
+def stream_prolog(source: typing.Union[str, os.PathLike, typing.IO],
+                  chunk_size: int = 1 << 16) -> typing.Iterator[typing.Any]:
+    """Parses a prolog program clause by clause, reading it chunk_size characters at a time
+
+    Source can be a path or an open text stream. Ground facts whose arguments are atoms, like `edge(a, b).`, are
+    built with a regular expression, everything else goes through the Lark parser one clause at a time. Only one
+    clause is held in memory at once, however long the program is.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source) as f:
+            yield from stream_prolog(f, chunk_size)
+        return
+
+    for text in _clauses(source, chunk_size):
+        clause = _clause(text)
+        if clause is not None:
+            yield clause
+
+
+def load_prolog(tb, source: typing.Union[str, os.PathLike, typing.IO], batch_size: int = 10000,
+                chunk_size: int = 1 << 16) -> int:
+    """Tells the rules and facts in a prolog program to a table, returning how many
+
+    The program is read with `stream_prolog` and told with `.tell_many()` in batches of batch_size, so memory use
+    depends on batch_size rather than the size of the program. Declarations are skipped.
+    """
+    n_told = 0
+    batch = []
+
+    def flush():
+        tb.tell_many(batch)
+        batch.clear()
+
+    for clause in stream_prolog(source, chunk_size):
+        if isinstance(clause, (language.Term, language.Rule)):
+            batch.append(clause)
+            n_told += 1
+        elif isinstance(clause, Tree) and (clause.data == "declaration"):
+            continue
+        else:
+            raise ValueError(f"{clause} is not a rule or a fact")
+
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    return n_told
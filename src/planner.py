@@ -0,0 +1,126 @@
+import typing
+from collections import defaultdict
+
+from src import language, unification, table
+
+
+class PlannedTable(table.AbstractTable):
+    """Wraps a table, reordering the conjuncts of rule bodies so the most selective ones run first
+
+    The wrapper keeps statistics about the table: how many clauses each predicate has and how many distinct values
+    appear in each argument position of its facts. When a rule is used, the terms in its body are ordered greedily: at
+    each step the term expected to produce the fewest rows, given the variables bound so far, goes next. The estimate
+    for a term is the predicate's cardinality divided by the number of distinct values in each bound argument position.
+    Constraints are run as soon as all their variables are bound, or left at the end. Cuts, `once` goals and negations
+    are barriers: goals are reordered between them, but never moved across one. Plans are cached per body and per set of
+    variables bound by the head, and thrown away when a predicate doubles in size. Only numbered rules (see
+    `language.Rule`) are planned, bodies which wrappers like `CompiledTable` build fresh for each call are left alone.
+
+    Reordering assumes the body is a pure conjunction, so don't wrap tables whose rules rely on the order of their
+    goals.
+
+    Arguments:
+        table: a table to wrap
+        rule_weight: how many rows a rule (as opposed to a fact) is guessed to contribute
+        default_selectivity: the fraction of rows a bound argument is guessed to keep, when there are no facts to
+            count distinct values in
+    """
+    def __init__(self, table: table.AbstractTable, rule_weight: int = 100, default_selectivity: float = 0.1):
+        self.table: table.AbstractTable = table
+        self.rule_weight = rule_weight
+        self.default_selectivity = default_selectivity
+
+        self.cardinality: typing.Dict[typing.Tuple[str, int], int] = defaultdict(int)
+        self.distinct: typing.Dict[typing.Tuple[str, int], typing.List[set]] = {}
+        self.plans: typing.Dict[typing.Tuple[language.Logical, frozenset], language.Logical] = {}
+
+        for rule in table.rules():
+            self._count(rule)
+
+    def _count(self, rule: language.Rule) -> None:
+        key = (rule.op, len(rule.args))
+        before = self.cardinality[key]
+        self.cardinality[key] += 1 if rule.body == language.YES else self.rule_weight
+        if before.bit_length() != self.cardinality[key].bit_length():
+            self.plans.clear()
+
+        if rule.body == language.YES:
+            if key not in self.distinct:
+                self.distinct[key] = [set() for _ in rule.args]
+            for values, arg in zip(self.distinct[key], rule.args):
+                if language.is_ground(arg):
+                    values.add(arg)
+
+    def estimate(self, goal: language.Term, bound: typing.AbstractSet[language.Variable]) -> float:
+        """Guesses how many rows the goal will produce if the variables in bound have values"""
+        key = (goal.op, len(goal.args))
+        rows = float(self.cardinality.get(key, 0))
+        distinct = self.distinct.get(key, [set() for _ in goal.args])
+        for values, arg in zip(distinct, goal.args):
+            if language.variables_in(arg) <= bound:
+                rows *= (1 / len(values)) if values else self.default_selectivity
+        return rows
+
+    def plan(self, body: language.Logical, bound: typing.AbstractSet[language.Variable]) -> language.Logical:
+        """Orders the goals in body, given which of its variables will be bound when it runs"""
+        key = (body, frozenset(bound))
+        if key not in self.plans:
+            bound, ordered, run = set(bound), [], []
+            for goal in language.And([body]).args:
+                if (goal == language.CUT) or isinstance(goal, language.Not) or\
+                        (isinstance(goal, language.Term) and goal.op == "once" and len(goal.args) == 1):
+                    ordered += self._order(run, bound)
+                    ordered.append(goal)
+                    run = []
+                    if not isinstance(goal, language.Not):  # a negation binds nothing
+                        bound |= language.variables_in(goal)
+                else:
+                    run.append(goal)
+            self.plans[key] = language.And(ordered + self._order(run, bound))
+        return self.plans[key]
+
+    def _order(self, remaining: typing.List[typing.Any],
+               bound: typing.Set[language.Variable]) -> typing.List[typing.Any]:
+        """orders goals with no barriers between them, adding the variables they bind to bound"""
+        remaining, ordered = list(remaining), []
+        while remaining:
+            ready = [goal for goal in remaining
+                     if not isinstance(goal, language.Term) and language.variables_in(goal) <= bound]
+            terms = [goal for goal in remaining if isinstance(goal, language.Term)]
+            if ready:
+                goal = ready[0]
+            elif terms:
+                goal = min(terms, key=lambda g: self.estimate(g, bound))
+            else:
+                goal = remaining[0]
+            remaining.remove(goal)
+            ordered.append(goal)
+            bound |= language.variables_in(goal)
+        return ordered
+
+    def match(self, query: language.Term, binding: unification.Trail,
+              conditional: bool = True) -> typing.Iterator[typing.Tuple[language.Logical, typing.Optional[int]]]:
+        for body, offset in self.table.match(query, binding, conditional=conditional):
+            if (offset is not None) and isinstance(body, language.And) and len(body.args) > 1:
+                bound = {var for var in language.variables_in(body)
+                         if language.is_ground(unification.resolve(var, binding, offset))}
+                body = self.plan(body, bound)
+            yield body, offset
+
+    def tell(self, rule: typing.Union[language.Term, language.Rule]) -> None:
+        if isinstance(rule, language.Term):
+            rule = language.Rule(rule, language.YES)
+        self.table.tell(rule)
+        self._count(rule)
+
+    def tell_many(self, rules: typing.Iterable[typing.Union[language.Term, language.Rule]]) -> None:
+        rules = [language.Rule(rule, language.YES) if isinstance(rule, language.Term) else rule for rule in rules]
+        self.table.tell_many(rules)
+        for rule in rules:
+            self._count(rule)
+
+    def fetch(self, query: language.Term, conditional: bool = True) -> typing.Iterator[language.Rule]:
+        return self.table.fetch(query, conditional=conditional)
+
+    def rules(self) -> typing.Iterable[language.Rule]:
+        return self.table.rules()
@@ -0,0 +1,179 @@
+import typing
+from collections import defaultdict
+
+from src import language, unification, table, inference
+
+
+class _Alpha:
+    """Memory of the facts matching one body pattern, shared by every rule using a variant of the pattern"""
+    def __init__(self, pattern: language.Term):
+        self.pattern = pattern
+        self.facts: typing.List[language.Term] = []
+        self.successors: typing.List[typing.Tuple["_Production", int]] = []
+
+
+class _Production:
+    """The join network for one rule
+
+    `betas[i]` holds the partial matches (bindings) of the first i conjuncts of the body. The terms in the body come
+    first, then its other goals, which filter the matches instead of having alpha memories, with negations last.
+    """
+    def __init__(self, rule: language.Rule, alphas: typing.List[typing.Optional[_Alpha]]):
+        self.rule = rule
+        body = [goal for goal in language.And([rule.body]).args if goal != language.CUT]
+        self.goals: typing.Tuple[typing.Any, ...] = tuple(
+            [goal for goal in body if isinstance(goal, language.Term)] +
+            [goal for goal in body if not isinstance(goal, (language.Term, language.Not))] +
+            [goal for goal in body if isinstance(goal, language.Not)])
+        self.alphas = alphas
+        self.betas: typing.List[typing.List[dict]] = [[{}]] + [[] for _ in self.goals]
+
+
+class ReteTable(table.AbstractTable):
+    """Wraps a table with a Rete network, deriving the consequences of each fact as it is told
+
+    Every rule with a body gets an alpha memory per body conjunct, holding the facts which match it, and a beta memory
+    per prefix of the body, holding the bindings which satisfy that prefix. Telling a fact adds it to the matching
+    alpha memories and joins it only with the partial matches already stored, so the work is proportional to the new
+    matches. Completed matches are told to the wrapped table and fed back into the network. Facts already in the table
+    are run through the network when it is built. Constraints and negations in a body are checked as each match
+    reaches them, like in `inference.fc_ask`, so a negation is only sound if the facts it negates aren't told later.
+
+    Use `.subscribe()` to be called back with derived facts as they appear.
+
+    Arguments:
+        table: a table to wrap
+    """
+    def __init__(self, table: table.AbstractTable):
+        self.table: table.AbstractTable = table
+        self.alphas: typing.Dict[language.Term, _Alpha] = {}
+        self.by_predicate: typing.Dict[typing.Tuple[str, int], typing.List[_Alpha]] = defaultdict(list)
+        self.productions: typing.List[_Production] = []
+        self.subscribers: typing.List[typing.Tuple[typing.Callable, typing.Optional[language.Term]]] = []
+        self.seen: typing.Set[language.Term] = set()
+
+        for rule in table.rules():
+            if rule.body != language.YES:
+                self._add_production(rule)
+        self._propagate(list(table.facts()), derived=False)
+
+    def subscribe(self, callback: typing.Callable[[language.Term], typing.Any],
+                  query: typing.Optional[language.Term] = None) -> None:
+        """Calls callback with each newly derived fact, or only the ones which unify with query if it is given"""
+        self.subscribers.append((callback, query))
+
+    def _alpha(self, pattern: language.Term) -> _Alpha:
+        key = language.variant(pattern)
+        if key not in self.alphas:
+            self.alphas[key] = _Alpha(pattern)
+            self.by_predicate[pattern.op, len(pattern.args)].append(self.alphas[key])
+            # facts which went through the network before this memory existed
+            for fact in self.table.fetch(pattern, conditional=False):
+                if language.variant(fact.head) in self.seen:
+                    head = fact.head if language.is_ground(fact.head) else language.standardize(fact.head)
+                    self.alphas[key].facts.append(head)
+        return self.alphas[key]
+
+    def _add_production(self, rule: language.Rule) -> typing.List[language.Term]:
+        """adds a rule to the network, returning the conclusions it draws from facts already known"""
+        production = _Production(rule, [])
+        for i, goal in enumerate(production.goals):
+            alpha = self._alpha(goal) if isinstance(goal, language.Term) else None
+            production.alphas.append(alpha)
+            if alpha is not None:
+                alpha.successors.append((production, i))
+        self.productions.append(production)
+
+        conclusions = []
+        for token in self._left(production, 0, {}):
+            conclusions.append(unification.resolve(rule.head, token))
+        return conclusions
+
+    def _left(self, production: _Production, i: int, token: dict) -> typing.Iterator[dict]:
+        """stores a match for the first i goals, yielding every complete match extending it"""
+        if i == len(production.goals):
+            yield token
+            return
+
+        if production.alphas[i] is None:
+            for extended in self._filter(production.goals[i], token):
+                for complete in self._left(production, i + 1, extended):
+                    yield complete
+            return
+
+        if i:
+            production.betas[i].append(token)
+        for fact in production.alphas[i].facts:
+            extended = unification.unify(production.goals[i], fact, token)
+            if extended != language.NO:
+                for complete in self._left(production, i + 1, extended):
+                    yield complete
+
+    def _filter(self, goal: typing.Any, token: dict) -> typing.Iterator[dict]:
+        """the extensions of a match under which a constraint or negation holds, given the facts in the table"""
+        for binding in inference._drive(inference._fc_join((goal,), self.table, None, unification.Trail(token))):
+            if inference._settled(binding):
+                yield binding.to_dict()
+
+    def _right(self, production: _Production, i: int, fact: language.Term) -> typing.Iterator[dict]:
+        """joins a new fact for goal i with the stored matches of the goals before it"""
+        for token in list(production.betas[i]):
+            extended = unification.unify(production.goals[i], fact, token)
+            if extended != language.NO:
+                for complete in self._left(production, i + 1, extended):
+                    yield complete
+
+    def _propagate(self, facts: typing.List[language.Term], derived: bool = True) -> None:
+        queue = [(fact, derived) for fact in facts]
+        while queue:
+            fact, derived = queue.pop()
+            if language.variant(fact) in self.seen:
+                continue
+            self.seen.add(language.variant(fact))
+            if not language.is_ground(fact):
+                fact = language.standardize(fact)
+
+            if derived:
+                self.table.tell(language.Rule(fact, language.YES))
+                for callback, query in self.subscribers:
+                    if (query is None) or unification.unifiable(query, fact):
+                        callback(fact)
+
+            for alpha in self.by_predicate.get((fact.op, len(fact.args)), ()):
+                if unification.unifiable(alpha.pattern, fact):
+                    alpha.facts.append(fact)
+                    for production, i in alpha.successors:
+                        for token in self._right(production, i, fact):
+                            queue.append((unification.resolve(production.rule.head, token), True))
+
+    def tell(self, rule: typing.Union[language.Term, language.Rule]) -> None:
+        if isinstance(rule, language.Term):
+            rule = language.Rule(rule, language.YES)
+
+        if rule.body == language.YES:
+            if language.variant(rule.head) not in self.seen:
+                self.table.tell(rule)
+            self._propagate([rule.head], derived=False)
+        else:
+            rule = language.standardize(rule)
+            self.table.tell(rule)
+            self._propagate(self._add_production(rule))
+
+    def tell_many(self, rules: typing.Iterable[typing.Union[language.Term, language.Rule]]) -> None:
+        # rules are added one at a time, then all the facts go to the table and through the network together
+        facts = {}
+        for rule in rules:
+            if isinstance(rule, language.Term):
+                rule = language.Rule(rule, language.YES)
+            if rule.body != language.YES:
+                self.tell(rule)
+            elif language.variant(rule.head) not in self.seen:
+                facts.setdefault(language.variant(rule.head), rule)
+        self.table.tell_many(facts.values())
+        self._propagate([rule.head for rule in facts.values()], derived=False)
+
+    def fetch(self, query: language.Term, conditional: bool = True) -> typing.Iterator[language.Rule]:
+        return self.table.fetch(query, conditional=conditional)
+
+    def rules(self) -> typing.Iterable[language.Rule]:
+        return self.table.rules()
@@ -0,0 +1,235 @@
+import bisect
+import hashlib
+import io
+import itertools
+import math
+import mmap
+import numbers
+import os
+import pickle
+import struct
+import sys
+import typing
+from array import array
+from collections import defaultdict
+
+from src import language, unification, table
+
+_MAGIC = b"LOGICKB\x01"
+_HEADER = struct.Struct("<8sQQ")  # magic, where the directory starts, how long it is
+_GROUND, _FACT = 1, 2  # flags kept for each rule
+
+
+def _normal(value: typing.Any) -> typing.Any:
+    """a value which pickles the same way for all values equal to this one, e.g. 1, 1.0 and True"""
+    if isinstance(value, language.Term):
+        return language.Term, value.op, tuple(map(_normal, value.args))
+    elif isinstance(value, tuple):
+        return tuple(map(_normal, value))
+    elif isinstance(value, numbers.Complex):
+        if value.imag == 0:
+            value = value.real
+        if isinstance(value, numbers.Real) and math.isfinite(value):
+            if value == int(value):
+                return int(value)
+            elif value == float(value):
+                return float(value)
+    return value
+
+
+def _key(value: typing.Any) -> int:
+    """a hash of a ground value which, unlike `hash`, is the same in every process, and equal for equal values"""
+    buffer = io.BytesIO()
+    pickler = pickle.Pickler(buffer, protocol=4)
+    pickler.fast = True  # no memo, so the bytes don't depend on which equal objects happen to be shared
+    pickler.dump(_normal(value))
+    return int.from_bytes(hashlib.blake2b(buffer.getvalue(), digest_size=8).digest(), "little")
+
+
+def save_snapshot(tb: table.AbstractTable, path: typing.Union[str, os.PathLike]) -> None:
+    """Writes the rules in a table, with an index on each argument position, to a file `SnapshotTable` can open
+
+    Each rule is pickled separately, so it can be decoded on its own, with ground facts stored as just their functor and
+    arguments. The index is the same as `table.HashTable`'s,
+    but stored as sorted arrays of (hashed value, rule) pairs which are searched where they lie in the file.
+    """
+    rules = [language.number_variables(rule) for rule in tb.rules()]
+    words = array("Q")
+
+    def put(values) -> typing.Tuple[int, int]:
+        start = len(words)
+        words.extend(values)
+        return start, len(words) - start
+
+    blob, offsets, flags = bytearray(), [0], bytearray()
+    by_predicate = defaultdict(list)
+    for i, rule in enumerate(rules):
+        record = (rule.op, rule.args) if rule.n_vars == 0 and rule.body == language.YES else\
+            (rule.head, rule.body, rule.n_vars)
+        blob += pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        offsets.append(len(blob))
+        flags.append((_GROUND if language.is_ground(rule.head) else 0) | (_FACT if rule.body == language.YES else 0))
+        by_predicate[rule.op, len(rule.args)].append(i)
+
+    predicates = {}
+    for (op, arity), ids in by_predicate.items():
+        positions = []
+        for position in range(arity):
+            ground = sorted((_key(rules[i].args[position]), i)
+                            for i in ids if language.is_ground(rules[i].args[position]))
+            positions.append((
+                put(k for k, _ in ground),
+                put(i for _, i in ground),
+                put(i for i in ids if not language.is_ground(rules[i].args[position])),
+            ))
+        predicates[op, arity] = (put(ids), positions)
+
+    offsets = put(offsets)
+    flags_start = _HEADER.size
+    words_start = flags_start + len(flags) + (-len(flags) % 8)
+    blob_start = words_start + words.itemsize * len(words)
+    directory = pickle.dumps({
+        "byteorder": sys.byteorder,
+        "n_rules": len(rules),
+        "flags": flags_start,
+        "words": (words_start, len(words)),
+        "blob": blob_start,
+        "offsets": offsets,
+        "predicates": predicates,
+    }, protocol=pickle.HIGHEST_PROTOCOL)
+
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, blob_start + len(blob), len(directory)))
+        f.write(flags)
+        f.write(bytes(words_start - flags_start - len(flags)))
+        f.write(words.tobytes())
+        f.write(blob)
+        f.write(directory)
+
+
+def _contains(ids: typing.Sequence[int], i: int) -> bool:
+    """whether i is in a sorted sequence of ids"""
+    at = bisect.bisect_left(ids, i)
+    return (at < len(ids)) and (ids[at] == i)
+
+
+class SnapshotTable(table.AbstractTable):
+    """A read-only table over a snapshot written by `save_snapshot`, opened through mmap
+
+    Opening a snapshot only reads its directory: the index is searched where it lies in the mapped file, and rules are
+    unpickled the first time a fetch touches them. Processes which open the same snapshot share its pages, so a pool
+    of workers can start almost instantly. Rules told to the table are kept in memory, in a `HashTable` searched after
+    the snapshot; the file is never changed. Pickling the table (e.g. to send it to a worker) pickles the path and the
+    rules told since, not the contents of the snapshot. `.close()` unmaps the file, as does leaving a `with` block:
+
+        with SnapshotTable(path) as tb:
+            list(bc_ask(tb, query))
+
+    Snapshots use the byte order of the machine which wrote them.
+
+    Arguments:
+        path: the snapshot to open
+    """
+    def __init__(self, path: typing.Union[str, os.PathLike]):
+        self.path = path
+        self.overlay = table.HashTable()
+        self._open()
+
+    def _open(self) -> None:
+        with open(self.path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, start, length = _HEADER.unpack_from(self._mmap)
+        if magic != _MAGIC:
+            raise ValueError(f"{self.path} is not a snapshot")
+        self.directory = pickle.loads(self._mmap[start:start + length])
+        if self.directory["byteorder"] != sys.byteorder:
+            raise ValueError(f"{self.path} was written on a {self.directory['byteorder']} endian machine")
+
+        words_start, n_words = self.directory["words"]
+        self._view = memoryview(self._mmap)
+        self._words = self._view[words_start:words_start + 8 * n_words].cast("Q")
+        self._offsets = self._array(self.directory["offsets"])
+        self._decoded: typing.Dict[int, language.Rule] = {}
+
+    def close(self) -> None:
+        """Unmaps the snapshot, after which the table can't be read"""
+        for view in (self._offsets, self._words, self._view):
+            view.release()
+        self._mmap.close()
+
+    def __enter__(self) -> "SnapshotTable":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __getstate__(self):
+        return {"path": self.path, "overlay": self.overlay}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._open()
+
+    def _array(self, where: typing.Tuple[int, int]) -> typing.Sequence[int]:
+        start, length = where
+        return self._words[start:start + length]
+
+    def _flags(self, i: int) -> int:
+        return self._mmap[self.directory["flags"] + i]
+
+    def _rule(self, i: int) -> language.Rule:
+        if i not in self._decoded:
+            start = self.directory["blob"]
+            record = pickle.loads(self._mmap[start + self._offsets[i]:start + self._offsets[i + 1]])
+            if self._flags(i) == _GROUND | _FACT:
+                op, args = record
+                self._decoded[i] = language.Rule(language.Term(op, args), language.YES, n_vars=0)
+            else:
+                self._decoded[i] = language.Rule(*record)
+        return self._decoded[i]
+
+    def _candidates(self, query: language.Term) -> typing.Iterable[int]:
+        ids, positions = self.directory["predicates"][query.op, len(query.args)]
+        buckets = []
+        for (keys, ground, variable), arg in zip(positions, query.args):
+            if language.is_ground(arg):
+                keys, key = self._array(keys), _key(arg)
+                exact = self._array(ground)[bisect.bisect_left(keys, key):bisect.bisect_right(keys, key)]
+                buckets.append((sorted(exact), self._array(variable)))
+        if not buckets:
+            return self._array(ids)
+
+        buckets.sort(key=lambda b: len(b[0]) + len(b[1]))
+        (exact, variable), rest = buckets[0], buckets[1:]
+        return sorted(
+            i for i in itertools.chain(exact, variable)
+            if all(_contains(other_exact, i) or _contains(other_variable, i) for other_exact, other_variable in rest)
+        )
+
+    def fetch(self, query: language.Term, conditional: bool = True) -> typing.Iterator[language.Rule]:
+        if (query.op, len(query.args)) in self.directory["predicates"]:
+            # as in HashTable, the index is exact for ground heads unless the query repeats a variable or nests one
+            query_vars = [arg for arg in query.args if isinstance(arg, language.Variable)]
+            exact = (len(set(query_vars)) == len(query_vars)) and\
+                all(isinstance(arg, language.Variable) or language.is_ground(arg) for arg in query.args)
+
+            for i in self._candidates(query):
+                flags = self._flags(i)
+                if (flags & _FACT) or conditional:
+                    rule = self._rule(i)
+                    if (exact and (flags & _GROUND) and all(a == b for a, b in zip(rule.args, query.args)
+                                                            if not isinstance(b, language.Variable))) or\
+                            (unification.unify(rule.head, query) != language.NO):
+                        yield rule
+
+        for rule in self.overlay.fetch(query, conditional=conditional):
+            yield rule
+
+    def tell(self, rule: typing.Union[language.Term, language.Rule]) -> None:
+        self.overlay.tell(rule)
+
+    def tell_many(self, rules: typing.Iterable[typing.Union[language.Term, language.Rule]]) -> None:
+        self.overlay.tell_many(rules)
+
+    def rules(self) -> typing.Iterable[language.Rule]:
+        return itertools.chain((self._rule(i) for i in range(self.directory["n_rules"])), self.overlay.rules())
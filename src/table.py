@@ -1,13 +1,27 @@
 import abc
+import bisect
 import functools
 import itertools
+import math
 import typing
 from collections import defaultdict
 
-from src import language, unification
+from src import language, unification, tracing, constraints
 
 
 TYPE_RULES = typing.Optional[typing.Iterable[language.Rule]]
+TYPE_MATCHES = typing.Iterator[typing.Tuple[language.Logical, typing.Optional[int]]]
+
+
+def _numbered(rules: typing.Iterable[typing.Union[language.Term, language.Rule]]) -> typing.Iterator[language.Rule]:
+    """numbers the variables of each rule for storing, taking a shortcut for ground facts"""
+    for rule in rules:
+        if isinstance(rule, language.Term):
+            if language.is_ground(rule):
+                yield language.Rule(rule, language.YES, n_vars=0)
+                continue
+            rule = language.Rule(rule, language.YES)
+        yield language.number_variables(rule)
 
 
 class AbstractTable(abc.ABC):
@@ -35,21 +49,67 @@ class AbstractTable(abc.ABC):
         """An iterable over the rules in the table"""
         pass
 
+    def tell_many(self, rules: typing.Iterable[typing.Union[language.Term, language.Rule]]) -> None:
+        """Adds every rule to the table, tables which can build their indexes in bulk override this"""
+        for rule in rules:
+            self.tell(rule)
+
     def facts(self):
         return (rule.head for rule in self.rules() if rule.body == language.YES)
 
+    def negation(self, goal: language.Logical, patience: float) -> typing.Optional[bool]:
+        """Whether goal has no proof within patience, for tables which remember it (see `negation.NegationTable`)
+
+        Returns None if the table doesn't know.
+        """
+        return None
+
+    def remember_negation(self, goal: language.Logical, patience: float, holds: bool) -> None:
+        """Offers the table whether goal has no proof within patience, tables which don't memoize ignore it"""
+        pass
+
+    def match(self, query: language.Term, binding: unification.Trail,
+              conditional: bool = True) -> typing.Iterator[typing.Tuple[language.Logical, typing.Optional[int]]]:
+        """unifies the query with the head of each rule on the trail, yielding the body of every rule that matches
+
+        Bodies of numbered rules are not copied: each is yielded with the offset which renames it apart (see
+        `language.rename`), or with None if it needs no renaming. The bindings made for a rule are rolled back when
+        the generator is resumed, so each body should be used before asking for the next one.
+        """
+        return self.unify_heads(query, self.fetch(query, conditional=conditional), binding)
+
+    def unify_heads(self, query: language.Term, rules: typing.Iterable[language.Rule],
+                    binding: unification.Trail) -> TYPE_MATCHES:
+        """the loop behind `.match()`, for tables which find the rules to match some other way"""
+        tracer = tracing.active
+        for rule in rules:
+            if tracer is not None:
+                tracer.candidate(query)
+            mark = binding.checkpoint()
+            if rule.n_vars is None:
+                rule = language.standardize(rule)
+                if binding.unify(rule.head, query):
+                    yield rule.body, None
+            else:
+                offset = language.fresh_id(rule.n_vars)
+                if unification.unify_renamed(rule.head, offset, query, binding):
+                    yield rule.body, offset
+            binding.rollback(mark)
+
 
 class LinearTable(AbstractTable):
     """A table where complexity is linear"""
     def __init__(self, rules: TYPE_RULES = ()):
         self._rules = []
-        for rule in rules:
-            self.tell(rule)
+        self.tell_many(rules)
 
     def tell(self, rule: typing.Union[language.Term, language.Rule]) -> None:
         if isinstance(rule, language.Term):
             rule = language.Rule(rule, language.YES)
-        self._rules.append(language.standardize(rule))
+        self._rules.append(language.number_variables(rule))
+
+    def tell_many(self, rules: typing.Iterable[typing.Union[language.Term, language.Rule]]) -> None:
+        self._rules.extend(_numbered(rules))
 
     def rules(self) -> typing.Iterable[language.Rule]:
         return tuple(self._rules)
@@ -67,8 +127,7 @@ class TrieTable(AbstractTable):
         self._rules: typing.List[language.Rule] = []
         self.trie: typing.Dict[str, TrieTable] = defaultdict(TrieTable)
 
-        for rule in rules:
-            self.tell(rule)
+        self.tell_many(rules)
 
     def tell_destructured(self, head: tuple, rule: language.Rule):
         if head:
@@ -79,9 +138,17 @@ class TrieTable(AbstractTable):
     def tell(self, rule: typing.Union[language.Term, language.Rule]) -> None:
         if isinstance(rule, language.Term):
             rule = language.Rule(rule, language.YES)
-        rule = language.standardize(rule)
+        rule = language.number_variables(rule)
         self.tell_destructured((rule.head.op, *rule.head.args), rule)
 
+    def tell_many(self, rules: typing.Iterable[typing.Union[language.Term, language.Rule]]) -> None:
+        # walks down the trie in a loop instead of recursing through tell_destructured for every rule
+        for rule in _numbered(rules):
+            node = self
+            for key in (rule.head.op, *rule.head.args):
+                node = node.trie[key]
+            node._rules.append(rule)
+
     # noinspection PyStatementEffect
     def _fetch(self, query: tuple, conditional: bool) -> typing.Iterator[language.Rule]:
         if query:
@@ -108,6 +175,205 @@ class TrieTable(AbstractTable):
                 yield rule
 
 
+class HashTable(AbstractTable):
+    """Table hashing the ground arguments of each rule head by argument position
+
+    Rule heads are grouped by functor and arity. For each argument position there is a hash from ground values to
+    the rules with that value there, and a separate bucket for rules with a variable (or a term containing one) in
+    that position. A fetch probes the smallest bucket among the query's ground arguments and checks the others by
+    membership, so lookups on a bound argument don't depend on how many rows the predicate has. Fetching never
+    changes the table.
+    """
+    def __init__(self, rules: TYPE_RULES = ()):
+        self._rules: typing.List[language.Rule] = []
+        self._ground: typing.List[bool] = []
+        self.predicates: typing.Dict[typing.Tuple[str, int], typing.List[int]] = {}
+        self.index: typing.Dict[typing.Tuple[str, int], typing.List[typing.Dict[typing.Any, typing.Set[int]]]] = {}
+        self.variable: typing.Dict[typing.Tuple[str, int], typing.List[typing.Set[int]]] = {}
+
+        self.tell_many(rules)
+
+    def tell(self, rule: typing.Union[language.Term, language.Rule]) -> None:
+        if isinstance(rule, language.Term):
+            rule = language.Rule(rule, language.YES)
+        rule = language.number_variables(rule)
+
+        key = (rule.op, len(rule.args))
+        if key not in self.predicates:
+            self.predicates[key] = []
+            self.index[key] = [{} for _ in rule.args]
+            self.variable[key] = [set() for _ in rule.args]
+
+        i = len(self._rules)
+        self._rules.append(rule)
+        self._ground.append(language.is_ground(rule.head))
+        self.predicates[key].append(i)
+        for position, arg in enumerate(rule.args):
+            if language.is_ground(arg):
+                self.index[key][position].setdefault(arg, set()).add(i)
+            else:
+                self.variable[key][position].add(i)
+
+    def tell_many(self, rules: typing.Iterable[typing.Union[language.Term, language.Rule]]) -> None:
+        start = len(self._rules)
+        self._rules.extend(_numbered(rules))
+
+        # a run of rules for the same predicate shares the lookups of its index
+        def predicate(i):
+            return self._rules[i].op, len(self._rules[i].args)
+
+        for key, run in itertools.groupby(range(start, len(self._rules)), key=predicate):
+            if key not in self.predicates:
+                self.predicates[key] = []
+                self.index[key] = [{} for _ in range(key[1])]
+                self.variable[key] = [set() for _ in range(key[1])]
+
+            ids, index, variable = self.predicates[key], self.index[key], self.variable[key]
+            for i in run:
+                ground = True
+                for position, arg in enumerate(self._rules[i].args):
+                    if language.is_ground(arg):
+                        index[position].setdefault(arg, set()).add(i)
+                    else:
+                        variable[position].add(i)
+                        ground = False
+                ids.append(i)
+                self._ground.append(ground)
+
+    def rules(self) -> typing.Iterable[language.Rule]:
+        return tuple(self._rules)
+
+    def _candidates(self, query: language.Term) -> typing.Iterable[int]:
+        key = (query.op, len(query.args))
+        buckets = [
+            (self.index[key][position].get(arg, ()), self.variable[key][position])
+            for position, arg in enumerate(query.args) if language.is_ground(arg)
+        ]
+        if not buckets:
+            return self.predicates[key]
+
+        buckets.sort(key=lambda b: len(b[0]) + len(b[1]))
+        (exact, variable), rest = buckets[0], buckets[1:]
+        return sorted(
+            i for i in itertools.chain(exact, variable)
+            if all((i in other_exact) or (i in other_variable) for other_exact, other_variable in rest)
+        )
+
+    def fetch(self, query: language.Term, conditional: bool = True) -> typing.Iterator[language.Rule]:
+        if (query.op, len(query.args)) not in self.predicates:
+            return iter(())
+        return self._rows(query, self._candidates(query), conditional)
+
+    def _rows(self, query: language.Term, candidates: typing.Iterable[int],
+              conditional: bool) -> typing.Iterator[language.Rule]:
+        """the candidate rules which unify with query"""
+        # the hash lookups are exact for ground heads unless the query repeats a variable or has one inside a term
+        query_vars = [arg for arg in query.args if isinstance(arg, language.Variable)]
+        exact = (len(set(query_vars)) == len(query_vars)) and\
+            all(isinstance(arg, language.Variable) or language.is_ground(arg) for arg in query.args)
+
+        for i in candidates:
+            rule = self._rules[i]
+            if ((rule.body == language.YES) or conditional) and\
+                    ((exact and self._ground[i]) or (unification.unify(rule.head, query) != language.NO)):
+                yield rule
+
+
+class RangeIndex(HashTable):
+    """HashTable which also keeps the numbers in each argument position sorted, to fetch the rows within a range
+
+    `.fetch_range()` finds the rules whose arguments at some positions can lie in given intervals (see
+    `constraints.Interval`), by bisecting the sorted numbers and adding the rules with a variable there. The sorted
+    lists are built the first time a position is searched, and dropped when its predicate is told a rule. When a
+    goal is matched, its unbound arguments with domains from suspended comparisons (see `constraints.Ordering`) are
+    looked up this way, so only the rows inside those domains are fetched.
+
+    To push comparisons down into fetches, the bodies of numbered rules are matched with each comparison between a
+    variable and a number moved in front of the terms before it which use the variable, up to the nearest goal of
+    any other kind. `price(I, P) & LE(P, 100)` runs as `LE(P, 100) & price(I, P)`, suspending the comparison first.
+    Like `planner.PlannedTable`, this assumes the terms moved past are pure: a cut in one of them could commit to a
+    different row when fewer are fetched.
+    """
+    def __init__(self, rules: TYPE_RULES = ()):
+        self.sorted: typing.Dict[tuple, typing.Tuple[list, typing.List[int]]] = {}
+        self.plans: typing.Dict[language.Logical, language.Logical] = {}
+        super().__init__(rules)
+
+    def _forget(self, key: typing.Tuple[str, int]) -> None:
+        for position in range(key[1]):
+            self.sorted.pop((key, position), None)
+
+    def tell(self, rule: typing.Union[language.Term, language.Rule]) -> None:
+        super().tell(rule)
+        self._forget((self._rules[-1].op, len(self._rules[-1].args)))
+
+    def tell_many(self, rules: typing.Iterable[typing.Union[language.Term, language.Rule]]) -> None:
+        start = len(self._rules)
+        super().tell_many(rules)
+        for key in {(rule.op, len(rule.args)) for rule in self._rules[start:]}:
+            self._forget(key)
+
+    def _within(self, key: typing.Tuple[str, int], position: int, interval: constraints.Interval) -> typing.Set[int]:
+        """the rules whose argument at position is a number in interval or a variable"""
+        if (key, position) not in self.sorted:
+            # from the rules themselves, as keys equal in the hash index (like True and 1) needn't both be numbers
+            pairs = sorted((self._rules[i].args[position], i) for ids in self.index[key][position].values()
+                           for i in ids if constraints._is_number(self._rules[i].args[position]))
+            self.sorted[(key, position)] = ([value for value, _ in pairs], [i for _, i in pairs])
+        values, ids = self.sorted[(key, position)]
+
+        lo = (bisect.bisect_right if interval.lo_strict else bisect.bisect_left)(values, interval.lo)
+        hi = (bisect.bisect_left if interval.hi_strict else bisect.bisect_right)(values, interval.hi)
+        return set(ids[lo:hi]) | self.variable[key][position]
+
+    def fetch_range(self, query: language.Term, ranges: typing.Dict[int, constraints.Interval],
+                    conditional: bool = True) -> typing.Iterator[language.Rule]:
+        """Fetches the rules for query whose arguments at the positions in ranges can lie in the intervals given"""
+        key = (query.op, len(query.args))
+        if key not in self.predicates:
+            return iter(())
+
+        candidates = functools.reduce(set.intersection, sorted(
+            (self._within(key, position, interval) for position, interval in ranges.items()), key=len))
+        if any(language.is_ground(arg) for arg in query.args):
+            candidates = candidates.intersection(self._candidates(query))
+        return self._rows(query, sorted(candidates), conditional)
+
+    def pushdown(self, body: language.Logical) -> language.Logical:
+        """Moves the comparisons in body between a variable and a number in front of the terms which use the variable"""
+        if body not in self.plans:
+            ordered, start = [], 0  # goals from start on are terms the next comparison can move in front of
+            for goal in language.And([body]).args:
+                if isinstance(goal, constraints.Ordering) and any(
+                        isinstance(var, language.Variable) and constraints._is_number(other) and
+                        any(var in language.variables_in(term) for term in ordered[start:])
+                        for var, other in [(goal.x1, goal.x2), (goal.x2, goal.x1)]):
+                    ordered.insert(start, goal)
+                    start += 1
+                else:
+                    ordered.append(goal)
+                    if not isinstance(goal, language.Term) or goal.op == "once":
+                        start = len(ordered)
+            self.plans[body] = language.And(ordered)
+        return self.plans[body]
+
+    def match(self, query: language.Term, binding: unification.Trail,
+              conditional: bool = True) -> typing.Iterator[typing.Tuple[language.Logical, typing.Optional[int]]]:
+        ranges = {}
+        if binding.attributes:
+            for position, arg in enumerate(query.args):
+                suspension = binding.attribute(arg) if isinstance(arg, language.Variable) else None
+                if isinstance(suspension, constraints.Suspension) and\
+                        (suspension.domain.lo > -math.inf or suspension.domain.hi < math.inf):
+                    ranges[position] = suspension.domain
+
+        rows = self.fetch_range(query, ranges, conditional) if ranges else self.fetch(query, conditional)
+        for body, offset in self.unify_heads(query, rows, binding):
+            if (offset is not None) and isinstance(body, language.And) and len(body.args) > 1:
+                body = self.pushdown(body)
+            yield body, offset
+
+
 class HeuristicIndex(AbstractTable):
     """Wraps a table, sorting fetch results by projected usefulness
 
@@ -135,6 +401,9 @@ class HeuristicIndex(AbstractTable):
             rule = language.Rule(rule, language.YES)
         self.table.tell(rule)
 
+    def tell_many(self, rules: typing.Iterable[typing.Union[language.Term, language.Rule]]) -> None:
+        self.table.tell_many(rules)
+
     def fetch(self, query: language.Term, conditional: bool = True) -> typing.Iterator[language.Rule]:
         if not conditional:
             return self.table.fetch(query, conditional)
@@ -154,8 +423,7 @@ class PredicateIndex(AbstractTable):
     def __init__(self, rules: TYPE_RULES = (), factory: typing.Type[AbstractTable] = LinearTable):
         self.predicates: typing.Dict[str, AbstractTable] = {}
         self.factory: typing.Type[AbstractTable] = factory
-        for rule in rules:
-            self.tell(rule)
+        self.tell_many(rules)
 
     def rules(self) -> typing.Iterable[language.Rule]:
         return itertools.chain(*(t.rules() for t in self.predicates.values()))
@@ -167,6 +435,15 @@ class PredicateIndex(AbstractTable):
             self.predicates[rule.op] = self.factory()
         self.predicates[rule.op].tell(rule)
 
+    def tell_many(self, rules: typing.Iterable[typing.Union[language.Term, language.Rule]]) -> None:
+        by_predicate = defaultdict(list)
+        for rule in rules:
+            by_predicate[rule.op].append(rule)
+        for op, group in by_predicate.items():
+            if op not in self.predicates:
+                self.predicates[op] = self.factory()
+            self.predicates[op].tell_many(group)
+
     def fetch(self, query: language.Term, conditional: bool = True) -> typing.Iterator[language.Rule]:
         try:
             return self.predicates[query.op].fetch(query, conditional=conditional)
@@ -0,0 +1,120 @@
+import typing
+
+from src import language, unification, table, inference
+
+
+class TabledTable(table.AbstractTable):
+    """Wraps a table, memoizing the answers to tabled subgoals so backward chaining terminates on recursive rules
+
+    The first call to a tabled subgoal evaluates its clauses over and over, collecting answers in a table, until a
+    pass finds nothing new. Calls to a variant of a subgoal that is still being evaluated (e.g. left recursion, or
+    cycles in the data) read the answers found so far rather than searching again. Subgoals which depend on each
+    other are only marked complete once the earliest of them reaches its fixpoint. Complete tables answer later
+    calls directly and are kept until the table is told something new.
+
+    Tabled subgoals are always evaluated to completion, so `patience` only limits the untabled ones. A cut prunes
+    each pass over a subgoal's clauses, as it would a call in `inference.bc_ask`.
+
+    Arguments:
+        table: a table to wrap
+        predicates: names of the predicates to table, by default all of them
+    """
+    def __init__(self, table: table.AbstractTable, predicates: typing.Optional[typing.Iterable[str]] = None):
+        self.table: table.AbstractTable = table
+        self.predicates: typing.Optional[typing.FrozenSet[str]] = None if predicates is None else frozenset(predicates)
+        self.clear()
+
+    def clear(self) -> None:
+        """Throws away every answer table"""
+        self.answers: typing.Dict[language.Term, typing.List[language.Term]] = {}
+        self.seen: typing.Dict[language.Term, typing.Set[language.Term]] = {}
+        self.complete: typing.Set[language.Term] = set()
+        self.stack: typing.List[language.Term] = []
+        self.low: typing.Dict[language.Term, int] = {}
+        self.evaluated: typing.List[language.Term] = []
+        self.n_answers = 0
+
+    def tabled(self, query) -> bool:
+        return isinstance(query, language.Term) and ((self.predicates is None) or (query.op in self.predicates))
+
+    def _add(self, key: language.Term, answer: language.Term) -> None:
+        if language.variant(answer) not in self.seen[key]:
+            self.seen[key].add(language.variant(answer))
+            self.answers[key].append(answer)
+            self.n_answers += 1
+
+    def _evaluate(self, goal: language.Term, key: language.Term) -> None:
+        position = len(self.stack)
+        self.stack.append(key)
+        self.low[key] = position
+        start = len(self.evaluated)
+        self.evaluated.append(key)
+        self.answers.setdefault(key, [])
+        self.seen.setdefault(key, set())
+
+        try:
+            n_answers = None
+            while n_answers != self.n_answers:
+                n_answers = self.n_answers
+                trail, cut = unification.Trail(), inference._Cut()
+                for body, offset in self.table.match(goal, trail):
+                    for binding in inference._bc_and(self, body, trail, offset=offset, cut=cut):
+                        self._add(key, unification.resolve(goal, binding))
+                    if cut.fired:
+                        break
+        finally:
+            self.stack.pop()
+
+        if self.low[key] < position:
+            # depends on a subgoal further up the stack, which will evaluate this one again
+            caller = self.stack[-1]
+            self.low[caller] = min(self.low[caller], self.low[key])
+        else:
+            # leader of its dependencies, so everything evaluated under it is finished too
+            self.complete.update(self.evaluated[start:])
+            del self.evaluated[start:]
+
+    def lookup(self, goal: language.Term) -> typing.List[language.Term]:
+        """The answers to a tabled goal, evaluating it if it has no complete table"""
+        key = language.variant(goal)
+        if key in self.complete:
+            pass
+        elif key in self.stack:
+            caller = self.stack[-1]
+            self.low[caller] = min(self.low[caller], self.stack.index(key))
+        else:
+            self._evaluate(goal, key)
+        return self.answers[key]
+
+    def match(self, query: language.Term, binding: unification.Trail,
+              conditional: bool = True) -> typing.Iterator[typing.Tuple[language.Logical, typing.Optional[int]]]:
+        if not (conditional and self.tabled(query)):
+            for body, offset in self.table.match(query, binding, conditional=conditional):
+                yield body, offset
+            return
+
+        answers = self.lookup(unification.resolve(query, binding))
+        i = 0
+        while i < len(answers):  # the table can grow while we read it
+            answer = answers[i] if language.is_ground(answers[i]) else language.standardize(answers[i])
+            mark = binding.checkpoint()
+            if binding.unify(answer, query):
+                yield language.YES, None
+            binding.rollback(mark)
+            i += 1
+
+    def tell(self, rule: typing.Union[language.Term, language.Rule]) -> None:
+        if isinstance(rule, language.Term):
+            rule = language.Rule(rule, language.YES)
+        self.table.tell(rule)
+        self.clear()
+
+    def tell_many(self, rules: typing.Iterable[typing.Union[language.Term, language.Rule]]) -> None:
+        self.table.tell_many(rules)
+        self.clear()
+
+    def fetch(self, query: language.Term, conditional: bool = True) -> typing.Iterator[language.Rule]:
+        return self.table.fetch(query, conditional=conditional)
+
+    def rules(self) -> typing.Iterable[language.Rule]:
+        return self.table.rules()
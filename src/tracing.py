@@ -0,0 +1,117 @@
+import time
+import typing
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from src import language
+
+active: typing.Optional["Tracer"] = None
+"""the tracer collecting statistics, if any; the engine and tables check this once per goal or fetch"""
+
+
+@dataclass
+class ClauseStats:
+    tried: int = 0  # times the clause's head unified with a goal
+    answers: int = 0  # answers its body produced
+
+
+@dataclass
+class PredicateStats:
+    calls: int = 0  # goals resolved against the predicate
+    candidates: int = 0  # rules fetched for those goals
+    matched: int = 0  # rules whose heads unified
+    answers: int = 0
+    time: float = 0  # seconds spent resolving goals of this predicate, excluding the goals below them
+    clauses: typing.Dict[str, ClauseStats] = field(default_factory=lambda: defaultdict(ClauseStats))
+
+
+def label(goal: typing.Any) -> str:
+    """names the predicate of a goal, like path/2"""
+    if isinstance(goal, language.Term):
+        return f"{goal.op}/{len(goal.args)}"
+    return type(goal).__name__
+
+
+class Tracer:
+    """Collects counts and timings from backward chaining, per predicate and per clause
+
+    Use it as a context manager: searches resolved while it is active are traced, so consume them inside the block.
+    When no tracer is active the engine only pays for a check of `tracing.active` per goal.
+
+        with Tracer() as tracer:
+            list(bc_ask(tb, query))
+        print(tracer.report())
+
+    For each predicate it counts the goals resolved against it, the rules fetched for them (answers a `TabledTable`
+    replays aren't fetched, so aren't counted), the rules whose heads unified, and the answers. Time is self time: the
+    time spent on a goal's own clauses, not the goals below it. Clauses are told apart by their bodies, with facts
+    counted together. `.folded()` gives the time per stack of predicates in the folded format read by flamegraph.pl and
+    speedscope.
+    """
+    def __init__(self):
+        self.predicates: typing.Dict[str, PredicateStats] = defaultdict(PredicateStats)
+        self.stacks: typing.Dict[typing.Tuple[str, ...], float] = defaultdict(float)
+        self.max_depth = 0
+        self._stack: typing.List[str] = []
+        self._child_time: typing.List[float] = []
+        self._previous: typing.Optional[Tracer] = None
+
+    def __enter__(self) -> "Tracer":
+        global active
+        self._previous, active = active, self
+        return self
+
+    def __exit__(self, *exc) -> None:
+        global active
+        active = self._previous
+
+    def candidate(self, goal: typing.Any) -> None:
+        self.predicates[label(goal)].candidates += 1
+
+    def clause(self, goal: typing.Any, body: language.Logical) -> ClauseStats:
+        """records that a clause's head unified with goal, returning the clause's stats to count answers in"""
+        stats = self.predicates[label(goal)]
+        stats.matched += 1
+        clause = stats.clauses["fact" if body == language.YES else repr(body)]
+        clause.tried += 1
+        return clause
+
+    def trace(self, goal: typing.Any, search: typing.Iterator) -> typing.Iterator:
+        """wraps the search for a goal's answers, timing each time it is resumed"""
+        name = label(goal)
+        stats = self.predicates[name]
+        stats.calls += 1
+        while True:
+            self._stack.append(name)
+            self._child_time.append(0.0)
+            self.max_depth = max(self.max_depth, len(self._stack))
+            start = time.perf_counter()
+            try:
+                ans = next(search)
+            except StopIteration:
+                return
+            finally:
+                elapsed = time.perf_counter() - start
+                own = elapsed - self._child_time.pop()
+                stats.time += own
+                self.stacks[tuple(self._stack)] += own
+                self._stack.pop()
+                if self._child_time:
+                    self._child_time[-1] += elapsed
+            stats.answers += 1
+            yield ans
+
+    def report(self) -> str:
+        """A table of the statistics for each predicate and its clauses, slowest predicates first"""
+        lines = [f"{'predicate':30} {'calls':>8} {'fetched':>8} {'matched':>8} {'answers':>8} {'time (ms)':>10}"]
+        for name, stats in sorted(self.predicates.items(), key=lambda item: -item[1].time):
+            lines.append(f"{name:30} {stats.calls:8} {stats.candidates:8} {stats.matched:8} {stats.answers:8} "
+                         f"{stats.time * 1000:10.3f}")
+            for body, clause in stats.clauses.items():
+                lines.append(f"    {body[:45]:45} {clause.tried:8} {clause.answers:8}")
+        lines.append(f"max depth {self.max_depth}")
+        return "\n".join(lines)
+
+    def folded(self) -> str:
+        """The time per stack of predicates, one `a;b;c microseconds` line per stack"""
+        return "\n".join(f"{';'.join(stack)} {round(seconds * 1e6)}" for stack, seconds in self.stacks.items())
@@ -1,13 +1,101 @@
-from typing import Any, Union, Iterable
+from typing import Any, Iterable
+from collections.abc import Mapping
 from src import language
-from bidict import bidict
 import typing
 
 # types
-TYPE_BINDING = typing.Union[typing.Mapping[language.Variable, typing.Any], bidict, language.Keyword]
-TYPE_BINDING_OPTIONAL = typing.Optional[typing.Union[typing.Mapping[language.Variable, typing.Any], bidict,
-                                                     language.Keyword]]
-TYPE_BINDINGS = typing.Iterator[typing.Union[typing.Mapping[language.Variable, typing.Any], bidict, language.Keyword]]
+TYPE_BINDING = typing.Union[typing.Mapping[language.Variable, typing.Any], language.Keyword]
+TYPE_BINDING_OPTIONAL = typing.Optional[typing.Union[typing.Mapping[language.Variable, typing.Any], language.Keyword]]
+TYPE_BINDINGS = typing.Iterator[typing.Union[typing.Mapping[language.Variable, typing.Any], language.Keyword]]
+
+
+class _Restore(typing.NamedTuple):
+    """an entry on the trail putting back a variable's attribute on rollback"""
+    var: language.Variable
+    attribute: Any
+
+
+class Trail(Mapping):
+    """A mutable binding store which remembers the order variables were bound in, so bindings can be undone
+
+    Unifying against a trail binds variables in place instead of copying the binding. The inference engine takes a
+    `.checkpoint()` before trying a clause and calls `.rollback()` with it on backtrack, which undoes every binding
+    made since the checkpoint. Use `.to_dict()` to get a plain dict out, e.g. when an answer is yielded.
+
+    Unbound variables can also carry an attribute, which is undone by a rollback like a binding. When a variable with
+    an attribute is bound, unification calls the attribute's `.wake(var, trail)` and fails if it returns False. This
+    is how constraints on unbound variables are suspended (see `constraints.Suspension`). Trails which never set an
+    attribute don't pay for them.
+
+    Arguments:
+        binding: initial bindings, these are never undone by a rollback
+    """
+    def __init__(self, binding: TYPE_BINDING_OPTIONAL = None):
+        self.binding: typing.Dict[language.Variable, typing.Any] = dict(binding) if binding else {}
+        self.trail: typing.List[typing.Union[language.Variable, _Restore]] = []
+        self.attributes: typing.Optional[typing.Dict[language.Variable, Any]] = None
+
+    def __getitem__(self, var):
+        return self.binding[var]
+
+    def __contains__(self, var):
+        return var in self.binding
+
+    def __iter__(self):
+        return iter(self.binding)
+
+    def __len__(self):
+        return len(self.binding)
+
+    def __repr__(self):
+        return f"Trail({self.binding})"
+
+    def bind(self, var: language.Variable, val: Any) -> None:
+        self.binding[var] = val
+        self.trail.append(var)
+
+    def checkpoint(self) -> int:
+        """Marks the current state of the trail, to be passed to `.rollback()` later"""
+        return len(self.trail)
+
+    def rollback(self, mark: int) -> None:
+        """Undoes every binding made since the checkpoint"""
+        if self.attributes is None:
+            while len(self.trail) > mark:
+                del self.binding[self.trail.pop()]
+            return
+
+        while len(self.trail) > mark:
+            entry = self.trail.pop()
+            if type(entry) is _Restore:
+                if entry.attribute is None:
+                    del self.attributes[entry.var]
+                else:
+                    self.attributes[entry.var] = entry.attribute
+            else:
+                del self.binding[entry]
+
+    def attribute(self, var: language.Variable) -> Any:
+        """The attribute of an unbound variable, or None"""
+        return None if self.attributes is None else self.attributes.get(var)
+
+    def set_attribute(self, var: language.Variable, attribute: Any) -> None:
+        """Sets the attribute of an unbound variable, until a rollback past this point"""
+        if self.attributes is None:
+            self.attributes = {}
+        self.trail.append(_Restore(var, self.attributes.get(var)))
+        self.attributes[var] = attribute
+
+    def unify(self, x: Any, y: Any) -> bool:
+        """Unifies x and y in place, leaving the trail untouched if they do not unify"""
+        mark = self.checkpoint()
+        if unify_in(x, y, self):
+            return True
+        self.rollback(mark)
+        return False
+
+    def to_dict(self) -> dict:
+        return dict(self.binding)
 
 
 def value(var, binding):
@@ -23,25 +111,58 @@ def value(var, binding):
         return binding[var]
 
 
-def unify_variable(var: language.Variable, val: Any, binding: TYPE_BINDING) -> TYPE_BINDING:
-    if var in binding:
-        return unify(binding[var], val, binding)
-    elif val in binding.inverse:
-        return unify(var, binding.inverse[val], binding)
-    elif var in language.variables_in(val):  # occur check
-        return language.NO
-    else:
-        binding[var] = val
-        return binding
+def walk(x, binding):
+    """follows x through the binding until reaching something that is not a bound variable"""
+    while isinstance(x, language.Variable) and x in binding:
+        x = binding[x]
+    return x
 
 
-def unify_term(x: language.Term, y: language.Term, binding: TYPE_BINDING) -> TYPE_BINDING:
-    """Unifies two compounds, optionally subject to a binding, returning a binding
+def resolve(x, binding, offset: typing.Optional[int] = None):
+    """Substitutes bindings for variables in x, including variables inside the values they are bound to
+
+    If an offset is given, x comes from a numbered rule and the offset is added to the ids of its variables first
+    (see `language.rename`). Values in the binding are never renamed.
     """
-    if not len(x.args) == len(y.args):
-        return language.NO
-    else:
-        return unify(x.args, y.args, unify(x.op, y.op, binding))
+    if isinstance(x, language.Variable):
+        if offset is not None:
+            x = x.__class__(x.name, x._id + offset)
+        val = walk(x, binding)
+        return x if val is x else resolve(val, binding)
+    elif isinstance(x, tuple):
+        return tuple(resolve(item, binding, offset) for item in x)
+    elif isinstance(x, language.Logical):
+        return x.map(lambda item: resolve(item, binding, offset))
+    return x
+
+
+def occurs(var: language.Variable, x: Any, binding: TYPE_BINDING) -> bool:
+    """Whether var appears anywhere in x under the binding"""
+    x = walk(x, binding)
+    if x == var:
+        return True
+    elif isinstance(x, language.Term):
+        return any(occurs(var, arg, binding) for arg in x.args)
+    elif isinstance(x, tuple):
+        return any(occurs(var, item, binding) for item in x)
+    return False
+
+
+def unify_variable(var: language.Variable, val: Any, trail: Trail) -> bool:
+    """Binds an unbound variable to val on the trail"""
+    if occurs(var, val, trail):
+        return False
+    trail.bind(var, val)
+    if trail.attributes is not None:
+        attribute = trail.attributes.get(var)
+        if attribute is not None:
+            return attribute.wake(var, trail)
+    return True
+
+
+def unify_term(x: language.Term, y: language.Term, trail: Trail) -> bool:
+    """Unifies two compounds on the trail"""
+    return (len(x.args) == len(y.args)) and (x.op == y.op) and unify_tuple(x.args, y.args, trail)
 
 
 # TODO fix tail unification
@@ -54,47 +175,76 @@ def tail(item: tuple) -> bool:
         return False
 
 
-def unify_tuple(x: tuple, y: tuple, binding: TYPE_BINDING) -> TYPE_BINDING:
-    """
-    Unifies two tuples, optionally subject to a binding, returning a binding
+def unify_tuple(x: tuple, y: tuple, trail: Trail) -> bool:
+    """Unifies two tuples on the trail"""
+    for i in range(max(len(x), len(y))):
+        if tail(x[i:]):
+            return unify_in(x[i].to_var(), y[i:], trail)
+        elif tail(y[i:]):
+            return unify_in(y[i].to_var(), x[i:], trail)
+        elif (i >= len(x)) or (i >= len(y)) or not unify_in(x[i], y[i], trail):
+            return False
+    return True
+
+
+def unify_in(x: Any, y: Any, trail: Trail) -> bool:
+    """Unifies two objects by binding variables on the trail, returning whether it succeeded
+
+    On failure some bindings may already have been made, so callers should roll back to a checkpoint.
+    Use `Trail.unify` to have this done automatically.
     """
-    if tail(x):
-        return unify(x[0].to_var(), y, binding)
-    elif tail(y):
-        return unify(y[0].to_var(), x, binding)
-    elif bool(x) != bool(y):
-        return language.NO
+    x, y = walk(x, trail), walk(y, trail)
+
+    # we need stuff to be immutable
+    x = tuple(x) if isinstance(x, Iterable) and not isinstance(x, str) else x
+    y = tuple(y) if isinstance(y, Iterable) and not isinstance(y, str) else y
+
+    # figure out what it is a dispatch the correct unifier function
+    if x == y:
+        return True
+    elif isinstance(x, language.Variable):
+        return unify_variable(x, y, trail)
+    elif isinstance(y, language.Variable):
+        return unify_variable(y, x, trail)
+    elif isinstance(x, language.Term) and isinstance(y, language.Term):
+        return unify_term(x, y, trail)
+    elif isinstance(x, tuple) and isinstance(y, tuple):
+        return unify_tuple(x, y, trail)
     else:
-        return unify(x[1:], y[1:], unify(x[0], y[0], binding))
+        return False
+
+
+def unify_renamed(x: Any, offset: int, y: Any, trail: Trail) -> bool:
+    """Unifies x, renamed by adding offset to the ids of its variables, with y on the trail
+
+    Only the parts of x which get bound to a variable in y are actually renamed.
+    """
+    if isinstance(x, language.Variable):
+        return unify_in(x.__class__(x.name, x._id + offset), y, trail)
+    elif language.is_ground(x):
+        return unify_in(x, y, trail)
+
+    y = walk(y, trail)
+    if isinstance(x, language.Term) and isinstance(y, language.Term):
+        return (x.op == y.op) and (len(x.args) == len(y.args)) and\
+            all(unify_renamed(a, offset, b, trail) for a, b in zip(x.args, y.args))
+    return unify_in(language.rename(x, offset), y, trail)
 
 
 def unify(x: Any, y: Any, binding: TYPE_BINDING_OPTIONAL = None) -> TYPE_BINDING:
     """
     Unifies two objects, optionally subject a binding, and returns the resulting binding
+
+    The binding passed in is copied once and never modified. The inference engine uses a `Trail` directly instead.
     """
 
     # language.FAILs get passed up the callstack
     if binding == language.NO:
         return language.NO
 
-    # we might get weird user input formats
-    binding = bidict(binding)
-
-    # # we need stuff to be immutable
-    x = tuple(x) if isinstance(x, Iterable) and not isinstance(x, str) else x
-    y = tuple(y) if isinstance(y, Iterable) and not isinstance(x, str) else y
-
-    # figure out what it is a dispatch the correct unifier function
-    if x == y:
-        return binding
-    elif isinstance(x, language.Variable):
-        return unify_variable(x, y, binding)
-    elif isinstance(y, language.Variable):
-        return unify_variable(y, x, binding)
-    elif isinstance(x, language.Term) and isinstance(y, language.Term):
-        return unify_term(x, y, binding)
-    elif isinstance(x, tuple) and isinstance(y, tuple):
-        return unify_tuple(x, y, binding)
+    trail = Trail(binding)
+    if unify_in(x, y, trail):
+        return trail.binding
     else:
         return language.NO
 